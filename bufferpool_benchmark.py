@@ -0,0 +1,35 @@
+from lstore.db import Database
+from lstore.page import Page
+from time import process_time
+from random import randrange, seed
+
+# Measures the cost of one column read's worth of buffer pool work
+# (a lookup followed by a re-add, as Table.read_base_page does) while the pool grows.
+# Every key shares one clean Page so the numbers reflect pool bookkeeping only.
+seed(3562901)
+page = Page()
+number_of_reads = 100000
+
+for capacity in [1000, 10000, 100000]:
+    db = Database(bufferpool_capacity=capacity)
+    for i in range(capacity):
+        db.add_page_to_bufferpool('Grades', "base", i, 0, page)
+
+    # All hits: every read touches a resident page
+    keys = [randrange(0, capacity) for _ in range(number_of_reads)]
+    hit_time_0 = process_time()
+    for page_index in keys:
+        p = db.get_page_from_bufferpool('Grades', "base", page_index, 0)
+        db.add_page_to_bufferpool('Grades', "base", page_index, 0, p)
+    hit_time_1 = process_time()
+
+    # All misses: every read inserts a new page and evicts the coldest one
+    miss_time_0 = process_time()
+    for page_index in range(capacity, capacity + number_of_reads):
+        p = db.get_page_from_bufferpool('Grades', "base", page_index, 0)
+        db.add_page_to_bufferpool('Grades', "base", page_index, 0, page)
+    miss_time_1 = process_time()
+
+    hit_us = (hit_time_1 - hit_time_0) / number_of_reads * 1e6
+    miss_us = (miss_time_1 - miss_time_0) / number_of_reads * 1e6
+    print(f"capacity {capacity:>6} pages:\thit {hit_us:.2f} us/read\tmiss+evict {miss_us:.2f} us/read")
@@ -0,0 +1,48 @@
+from lstore.db import Database
+from lstore.query import Query
+from threading import Thread
+from time import perf_counter
+from random import choice, randint, seed
+
+# Transactions per second against one table as the number of worker threads grows,
+# once with a single buffer pool lock and once with the pool split into shards.
+# Each transaction is a group of point selects and updates, like the m3 testers.
+number_of_records = 10000
+number_of_transactions = 2000
+queries_per_transaction = 10
+
+def worker(query, keys, count, committed):
+    done = 0
+    for _ in range(count):
+        ok = True
+        for i in range(queries_per_transaction):
+            key = choice(keys)
+            if i % 5 == 4:
+                ok = query.update(key, None, randint(0, 20), None, None, None) and ok
+            else:
+                ok = query.select(key, 0, [1, 1, 1, 1, 1]) is not False and ok
+        done += 1 if ok else 0
+    committed.append(done)
+
+for shards in [1, 8]:
+    seed(3562901)
+    db = Database(bufferpool_capacity=1000, bufferpool_shards=shards)
+    grades_table = db.create_table('Grades', 5, 0)
+    query = Query(grades_table)
+    keys = []
+    for i in range(0, number_of_records):
+        query.insert(92106429 + i, randint(0, 20), randint(0, 20), randint(0, 20), randint(0, 20))
+        keys.append(92106429 + i)
+
+    for num_threads in [1, 2, 4, 8]:
+        committed = []
+        workers = [Thread(target=worker, args=(query, keys, number_of_transactions // num_threads, committed))
+                   for _ in range(num_threads)]
+        time_0 = perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        time_1 = perf_counter()
+        tps = number_of_transactions / (time_1 - time_0)
+        print(f"{shards} shard(s), {num_threads} worker(s):\t{tps:.0f} transactions/second\t({sum(committed)} committed)")
@@ -0,0 +1,632 @@
+import unittest
+import random
+from array import array
+import tempfile
+import shutil
+import time
+import threading
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lstore.bufferpool import BufferPool, ShardedBufferPool
+from lstore.page import Page, numpy
+from lstore.db import Database
+from lstore.query import Query
+from lstore.replacement import POLICIES
+from lstore.config import PAGE_SIZE
+from lstore.readahead import ReadAhead
+from lstore.segment import SegmentFile
+from lstore.page_directory import PageDirectory
+
+class TestPage(unittest.TestCase):
+    def test_bulk_read_and_write(self):
+        page = Page()
+        self.assertTrue(page.write_many(3, [7, -1, 2 ** 62]))
+        self.assertEqual(page.read_many(2, 6), [0, 7, -1, 2 ** 62])
+        self.assertEqual((page.num_records, page.dirty_map), (6, {3, 4, 5}))
+        self.assertFalse(page.write_many(510, [1, 2, 3]))
+
+        copy = Page()
+        copy.load_bytes(page.to_bytes())
+        self.assertEqual(copy.read(5), 2 ** 62)
+        self.assertEqual(page.to_bytes(3, 4), (7).to_bytes(8, 'little'))
+        self.assertEqual(page.size_bytes(), PAGE_SIZE)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy_view(self):
+        page = Page()
+        page.write_many(0, [1, 2, 3])
+        self.assertEqual(int(page.as_numpy()[:3].sum()), 6)
+
+class TestBufferPool(unittest.TestCase):
+    def setUp(self):
+        # Small pool so every test can fill it
+        self.pool = BufferPool(20 * PAGE_SIZE)
+
+    def fill(self, count):
+        pages = []
+        for i in range(count):
+            page = Page()
+            self.pool.put(("Grades", "base", i, 0), page)
+            pages.append(page)
+        return pages
+
+    def test_hit_moves_page_to_most_recent(self):
+        """Test that a hit protects a page from the next eviction"""
+        pages = self.fill(20)
+        self.assertIs(self.pool.get(("Grades", "base", 0, 0)), pages[0])
+
+        self.pool.put(("Grades", "base", 20, 0), Page())
+        self.assertIn(("Grades", "base", 0, 0), self.pool)
+        self.assertNotIn(("Grades", "base", 1, 0), self.pool)
+
+    def test_eviction_is_batched(self):
+        """Test that a full pool evicts a whole batch, not a single page"""
+        self.fill(20)
+        _, evicted = self.pool.put(("Grades", "base", 20, 0), Page())
+        self.assertEqual(len(evicted), self.pool.evict_batch)
+        self.assertEqual(len(self.pool), 20 - self.pool.evict_batch + 1)
+
+    def test_pinned_pages_are_not_evicted(self):
+        """Test that eviction skips pinned pages"""
+        pages = self.fill(20)
+        pages[0].pin()
+        pages[1].pin()
+
+        _, evicted = self.pool.put(("Grades", "base", 20, 0), Page())
+        evicted_keys = [key for key, _ in evicted]
+        self.assertNotIn(("Grades", "base", 0, 0), evicted_keys)
+        self.assertNotIn(("Grades", "base", 1, 0), evicted_keys)
+        self.assertIn(("Grades", "base", 2, 0), evicted_keys)
+
+    def test_all_pinned_runs_over_capacity(self):
+        """Test that a pool of pinned pages grows instead of evicting them"""
+        for page in self.fill(20):
+            page.pin()
+        _, evicted = self.pool.put(("Grades", "base", 20, 0), Page())
+        self.assertEqual(evicted, [])
+        self.assertEqual(len(self.pool), 21)
+
+    def test_dirty_victim_is_found_during_writeback(self):
+        """Test that a dirty page being written back is returned by get"""
+        pages = self.fill(20)
+        pages[0].write(42, 0)
+
+        _, evicted = self.pool.put(("Grades", "base", 20, 0), Page())
+        self.assertIn((("Grades", "base", 0, 0), pages[0]), evicted)
+        self.assertIs(self.pool.get(("Grades", "base", 0, 0)), pages[0])
+
+        self.pool.writeback_done(("Grades", "base", 0, 0), pages[0])
+        self.assertEqual(self.pool.writeback, {})
+        self.assertIn(("Grades", "base", 0, 0), self.pool)
+
+class TestMemoryAccounting(unittest.TestCase):
+    def test_pool_is_bounded_in_bytes(self):
+        """Test that small pages fit more of them into the same byte budget"""
+        pool = ShardedBufferPool(10 * PAGE_SIZE, shards=2)
+        for i in range(100):
+            page = Page()
+            page.data = array('q', bytes(PAGE_SIZE // 4))
+            pool.put(("Grades", "base", i, 0), page)
+            self.assertLessEqual(pool.resident_bytes, 10 * PAGE_SIZE)
+        self.assertGreater(len(pool), 10)
+        self.assertEqual(pool.resident_bytes, len(pool) * PAGE_SIZE // 4)
+
+    def test_peak_and_writeback_bytes(self):
+        """Test that dirty victims stay charged until they are written back"""
+        pool = BufferPool(4 * PAGE_SIZE)
+        pages = [Page() for _ in range(4)]
+        for i, page in enumerate(pages):
+            page.write(i, 0)
+            pool.put(("Grades", "base", i, 0), page)
+        self.assertEqual(pool.account.peak_resident_bytes, 4 * PAGE_SIZE)
+
+        _, evicted = pool.put(("Grades", "base", 4, 0), Page())
+        # The dirty victim is still charged until it has been written back
+        self.assertEqual(pool.resident_bytes, 5 * PAGE_SIZE)
+        for key, page in evicted:
+            pool.writeback_done(key, page)
+        self.assertEqual(pool.resident_bytes, 4 * PAGE_SIZE)
+        self.assertEqual(pool.account.peak_resident_bytes, 5 * PAGE_SIZE)
+
+    def test_put_during_writeback_charges_once(self):
+        """Test that putting a key still being written back takes that page back in"""
+        pool = BufferPool(2 * PAGE_SIZE)
+        dirty = Page()
+        dirty.write(1, 0)
+        pool.put(("Grades", "base", 0, 0), dirty)
+        pool.put(("Grades", "base", 1, 0), Page())
+        _, evicted = pool.put(("Grades", "base", 2, 0), Page())
+        self.assertIn((("Grades", "base", 0, 0), dirty), evicted)
+        # A reload of the victim from disk finds the in-memory page instead
+        resident, _ = pool.put(("Grades", "base", 0, 0), Page())
+        self.assertIs(resident, dirty)
+        for key, page in evicted:
+            pool.writeback_done(key, page)
+        self.assertEqual(pool.resident_bytes, sum(pool.sizes[key] for key in pool.pages))
+
+    def test_database_accounts_metadata_columns(self):
+        """Test that metadata columns are cached and charged like data columns"""
+        db = Database()
+        grades_table = db.create_table('Grades', 5, 0)
+        query = Query(grades_table)
+        query.insert(1, 2, 3, 4, 5)
+        # 5 data columns + 4 metadata columns
+        self.assertEqual(len(db.bufferpool), 9)
+        self.assertEqual(db.memory_usage()['resident_bytes'], 9 * PAGE_SIZE)
+
+class TestPageFlusher(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.db = Database(bufferpool_capacity=200, dirty_high_watermark=0.2, dirty_low_watermark=0.1)
+        self.db.open(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def dirty_bytes(self):
+        return sum(page.size_bytes() for _, page in self.db.bufferpool.dirty_pages())
+
+    def test_flush_down_to_low_watermark(self):
+        """Test that the flusher writes dirty pages once the high watermark is crossed"""
+        # Stop the thread so the test decides when flushing happens
+        self.db.flusher.stop()
+        grades_table = self.db.create_table('Grades', 5, 0)
+        query = Query(grades_table)
+        for i in range(3000):
+            query.insert(i, i, i, i, i)
+        self.assertGreater(self.dirty_bytes(), 0.2 * self.db.bufferpool_bytes)
+
+        self.assertGreater(self.db.flusher.flush_if_needed(), 0)
+        self.assertLessEqual(self.dirty_bytes(), 0.1 * self.db.bufferpool_bytes)
+        self.assertEqual(self.db.flusher.flush_if_needed(), 0)
+
+        self.db.flusher = None
+        self.db.close()
+        db = Database()
+        db.open(self.path)
+        query = Query(db.get_table('Grades'))
+        self.assertEqual(query.select(2999, 0, [1, 1, 1, 1, 1])[0].columns, [2999] * 5)
+        db.close()
+
+    def test_background_thread_flushes(self):
+        grades_table = self.db.create_table('Grades', 5, 0)
+        query = Query(grades_table)
+        for i in range(3000):
+            query.insert(i, i, i, i, i)
+        time.sleep(0.5)
+        self.assertGreater(self.db.flusher.pages_flushed, 0)
+        self.assertLessEqual(self.dirty_bytes(), 0.2 * self.db.bufferpool_bytes)
+        self.db.close()
+
+class TestOnlineWrites(unittest.TestCase):
+    def test_eviction_during_a_write_keeps_the_page(self):
+        for writer in ["checkpoint", "flusher"]:
+            path = tempfile.mkdtemp()
+            try:
+                db = Database(bufferpool_capacity=16, read_ahead_pages=0)
+                db.open(path)
+                flusher = db.flusher
+                flusher.stop()
+                flusher.high_watermark = flusher.low_watermark = 0
+                table = db.create_table('Grades', 5, 0)
+                query = Query(table)
+                for i in range(10):
+                    query.insert(i, i * 10, 0, 0, 0)
+
+                # Hold the write of column 1 of the base page until the page was read again
+                segment = db._segment('Grades', 'base')
+                write_page = segment.write_page
+                started = threading.Event()
+                release = threading.Event()
+
+                def held_write_page(page_index, col_index, *args, **kwargs):
+                    if (page_index, col_index) == (0, 1):
+                        started.set()
+                        release.wait()
+                    write_page(page_index, col_index, *args, **kwargs)
+                segment.write_page = held_write_page
+                write = threading.Thread(target=db.checkpoint if writer == "checkpoint" else flusher.flush_if_needed)
+                write.start()
+                try:
+                    self.assertTrue(started.wait(5))
+                    # Fill the pool with other pages, evicting everything that is not pinned
+                    for i in range(32):
+                        db.add_page_to_bufferpool('Other', 'base', i, 0, Page())
+                    self.assertEqual(table.read_base_page(1, 0, 3), 30)
+                finally:
+                    release.set()
+                    write.join()
+                self.assertEqual(table.read_base_page(1, 0, 3), 30)
+                db.flusher = None
+                db.close()
+            finally:
+                shutil.rmtree(path, ignore_errors=True)
+
+class TestReadAhead(unittest.TestCase):
+    def queued(self, read_ahead):
+        pages = []
+        while not read_ahead.requests.empty():
+            pages.append(read_ahead.requests.get()[2])
+        return pages
+
+    def test_sequential_access_queues_window(self):
+        """Test that the second page in a row starts reading ahead, random access does not"""
+        # Not started, so requests stay in the queue
+        read_ahead = ReadAhead(None, window=8)
+        read_ahead.on_access("Grades", "base", 5, 0)
+        read_ahead.on_access("Grades", "base", 9, 0)
+        self.assertEqual(self.queued(read_ahead), [])
+
+        read_ahead.on_access("Grades", "base", 10, 0)
+        self.assertEqual(self.queued(read_ahead), list(range(11, 19)))
+
+        # Topped up in half-window steps
+        for page_index in range(11, 16):
+            read_ahead.on_access("Grades", "base", page_index, 0)
+        self.assertEqual(self.queued(read_ahead), list(range(19, 24)))
+
+    def test_hint(self):
+        read_ahead = ReadAhead(None, window=4)
+        read_ahead.hint("Grades", "base", 8, 0)
+        self.assertEqual(self.queued(read_ahead), [0, 1, 2, 3])
+
+    def test_cold_scan_after_reopen(self):
+        """Test that a scan of a reopened database reads pages ahead and sums correctly"""
+        path = tempfile.mkdtemp()
+        try:
+            db = Database()
+            db.open(path)
+            query = Query(db.create_table('Grades', 5, 0))
+            for i in range(3000):
+                query.insert(i, i, 1, 1, 1)
+            db.close()
+
+            db = Database(bufferpool_capacity=20, read_ahead_pages=4)
+            db.open(path)
+            query = Query(db.get_table('Grades'))
+            self.assertEqual(query.sum(0, 2999, 1), sum(range(3000)))
+            self.assertGreater(db.read_ahead.pages_loaded, 0)
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+class TestStats(unittest.TestCase):
+    def test_counters_and_reset(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database(bufferpool_capacity=20)
+            db.open(path)
+            query = Query(db.create_table('Grades', 5, 0))
+            for i in range(3000):
+                query.insert(i, i, 1, 1, 1)
+            stats = db.stats()
+            self.assertGreater(stats['evictions'], 0)
+            self.assertEqual(stats['writebacks'], stats['tables']['Grades']['writebacks'])
+            self.assertGreaterEqual(stats['pages_written'], stats['writebacks'])
+            self.assertLessEqual(stats['bytes_written'], stats['pages_written'] * PAGE_SIZE)
+            self.assertLessEqual(stats['resident_bytes'], 20 * PAGE_SIZE)
+            db.close()
+
+            db = Database(bufferpool_capacity=20, read_ahead_pages=0)
+            db.open(path)
+            db.reset_stats()
+            query = Query(db.get_table('Grades'))
+            query.sum(0, 2999, 1)
+            stats = db.stats()
+            self.assertGreater(stats['misses'], 0)
+            self.assertEqual(stats['pages_read'], sum(stats['fault_latency'].values()))
+            self.assertEqual(stats['bytes_read'], stats['pages_read'] * PAGE_SIZE)
+            self.assertEqual(stats['tables']['Grades']['resident_pages'], stats['resident_pages'])
+
+            db.reset_stats()
+            stats = db.stats()
+            self.assertEqual((stats['hits'], stats['misses'], stats['pages_read']), (0, 0, 0))
+            self.assertEqual(stats['fault_latency'], {})
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+class TestLazyOpen(unittest.TestCase):
+    def test_pages_fault_in_on_first_access(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database()
+            db.open(path)
+            query = Query(db.create_table('Grades', 5, 0))
+            for i in range(2000):
+                query.insert(i, i, 1, 1, 1)
+            for i in range(0, 2000, 7):
+                query.update(i, None, None, 2, None, None)
+            db.close()
+
+            db = Database(read_ahead_pages=0)
+            db.open(path)
+            table = db.get_table('Grades')
+            self.assertEqual(db.stats()['pages_read'], 0)
+            self.assertTrue(all(page is None for page in table.base_pages[0].columns))
+            self.assertEqual([page.num_records for page in table.base_pages], [512, 512, 512, 464])
+
+            query = Query(table)
+            self.assertEqual(query.select(7, 0, [1, 1, 1, 1, 1])[0].columns, [7, 7, 2, 1, 1])
+            self.assertEqual(query.select(8, 0, [1, 1, 1, 1, 1])[0].columns, [8, 8, 1, 1, 1])
+            self.assertGreater(db.stats()['pages_read'], 0)
+            self.assertLess(db.stats()['pages_read'], 20)
+            db.close()
+
+            db = Database(read_ahead_pages=0)
+            db.open(path, lazy=False)
+            table = db.get_table('Grades')
+            self.assertEqual(db.stats()['pages_read'], 9 * (len(table.base_pages) + len(table.tail_pages)))
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+class TestCheckpoint(unittest.TestCase):
+    def test_dirty_pages_written_once(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database()
+            db.open(path)
+            query = Query(db.create_table('Grades', 5, 0))
+            for i in range(1000):
+                query.insert(i, i, 1, 1, 1)
+            db.reset_stats()
+            self.assertEqual(db.checkpoint(), 9 * 2)
+            self.assertEqual(db.stats()['pages_written'], 9 * 2)
+            self.assertEqual(db.checkpoint(), 0)
+
+            # One update dirties a record of the base page and a new tail page
+            db.reset_stats()
+            query.update(600, None, None, 5, None, None)
+            written = db.checkpoint()
+            self.assertEqual(db.stats()['pages_written'], written)
+            self.assertLess(db.stats()['bytes_written'], written * PAGE_SIZE)
+
+            # The checkpoint alone is enough for another process to see the data
+            other = Database()
+            other.open(path)
+            other_query = Query(other.get_table('Grades'))
+            self.assertEqual(other_query.select(600, 0, [1, 1, 1, 1, 1])[0].columns, [600, 600, 5, 1, 1])
+            self.assertEqual(other_query.sum(0, 999, 1), sum(range(1000)))
+            other.close()
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_parallel_checkpoint_and_load(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database(io_threads=4)
+            db.open(path)
+            for name in ['A', 'B']:
+                query = Query(db.create_table(name, 20, 0))
+                for i in range(3000):
+                    query.insert(i, *range(1, 20))
+            # 6 logical pages of 24 physical pages per table, several batches each
+            self.assertEqual(db.checkpoint(), 2 * 6 * 24)
+            db.close()
+
+            db = Database(io_threads=4, read_ahead_pages=0)
+            db.open(path, lazy=False)
+            self.assertEqual(db.stats()['pages_read'], 2 * 6 * 24)
+            for name in ['A', 'B']:
+                query = Query(db.get_table(name))
+                self.assertEqual(query.sum(0, 2999, 19), 19 * 3000)
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+class TestSegmentFile(unittest.TestCase):
+    def test_fixed_slots(self):
+        path = tempfile.mkdtemp()
+        try:
+            segment = SegmentFile(os.path.join(path, "base.seg"), 9)
+            segment.write_page(2, 4, bytes([7]) * PAGE_SIZE, 512)
+            segment.write_page(0, 1, bytes([1]) * 16, 2, encoding=3)
+            self.assertEqual(segment.read_page(2, 4), (bytes([7]) * PAGE_SIZE, 512, 0))
+            self.assertEqual(segment.read_page(0, 1), (bytes([1]) * 16, 2, 3))
+            # Slots before the last written one are holes, slots after it do not exist
+            self.assertEqual(segment.read_page(1, 3), (bytes(PAGE_SIZE), 0, 0))
+            self.assertIsNone(segment.read_page(3, 0))
+            self.assertEqual(segment.num_pages(), 3)
+            self.assertEqual(segment.read_num_records(2, 4), 512)
+            with self.assertRaises(ValueError):
+                segment.write_page(0, 0, bytes(PAGE_SIZE + 8), 0)
+            segment.close()
+
+            db = Database()
+            db.open(path)
+            query = Query(db.create_table('Grades', 5, 0))
+            for i in range(1000):
+                query.insert(i, i, 1, 1, 1)
+            db.close()
+            self.assertEqual(sorted(os.listdir(os.path.join(path, 'Grades'))), ['base.seg', 'catalog.bin'])
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_mmap_pages(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database()
+            db.open(path)
+            query = Query(db.create_table('Grades', 5, 0))
+            for i in range(2000):
+                query.insert(i, i, 1, 1, 1)
+            db.close()
+
+            db = Database(bufferpool_capacity=30, mmap_pages=True)
+            db.open(path)
+            table = db.get_table('Grades')
+            query = Query(table)
+            self.assertEqual(query.sum(0, 1999, 1), sum(range(2000)))
+            page = db.get_page_from_bufferpool('Grades', 'base', 3, 1)
+            self.assertIsInstance(page.data, memoryview)
+            # The first write copies the page out of the mapping
+            self.assertTrue(query.update(1999, None, None, 5, None, None))
+            self.assertEqual(query.select(1999, 0, [1, 1, 1, 1, 1])[0].columns, [1999, 1999, 5, 1, 1])
+            db.close()
+
+            db = Database(mmap_pages=True)
+            db.open(path)
+            query = Query(db.get_table('Grades'))
+            self.assertEqual(query.select(1999, 0, [1, 1, 1, 1, 1])[0].columns, [1999, 1999, 5, 1, 1])
+            self.assertEqual(query.select(5, 0, [1, 1, 1, 1, 1])[0].columns, [5, 5, 1, 1, 1])
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+class TestPageGeometry(unittest.TestCase):
+    def test_per_table_page_size(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database(page_size=16384)
+            db.open(path)
+            small = db.create_table('Small', 3, 0, page_size=1024, base_pages_per_range=4)
+            large = db.create_table('Large', 3, 0)
+            for table in [small, large]:
+                query = Query(table)
+                for i in range(1000):
+                    query.insert(i, i * 2, 1)
+            # 128 records per 1 KiB page, 2048 per 16 KiB page
+            self.assertEqual(len(small.base_pages), 8)
+            self.assertEqual(len(large.base_pages), 1)
+            db.close()
+
+            db = Database()
+            db.open(path)
+            small = db.get_table('Small')
+            self.assertEqual((small.geometry.page_size, small.geometry.base_pages_per_range), (1024, 4))
+            self.assertEqual(db.get_table('Large').geometry.records_per_page, 2048)
+            query = Query(small)
+            self.assertEqual(query.select(999, 0, [1, 1, 1])[0].columns, [999, 1998, 1])
+            self.assertEqual(query.sum(0, 999, 1), 999 * 1000)
+            query.insert(1000, 2000, 1)
+            self.assertEqual(len(small.base_pages), 8)
+            db.close()
+
+            with self.assertRaises(ValueError):
+                Database(page_size=1001)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+class TestPageDirectory(unittest.TestCase):
+    def test_packed_locations(self):
+        directory = PageDirectory(512)
+        directory[0] = [0, 0]
+        directory[4] = [3, 511]  # rid 2 was used up by a rejected insert
+        directory[1] = [7, 5]
+        self.assertEqual((directory[4], directory[1]), ((3, 511), (7, 5)))
+        self.assertNotIn(2, directory)
+        self.assertIsNone(directory.get(3))
+        with self.assertRaises(KeyError):
+            directory[2]
+        self.assertEqual(len(directory), 3)
+        self.assertEqual(directory, {0: [0, 0], 4: [3, 511], 1: [7, 5]})
+        self.assertEqual(directory.nbytes(), 4 * 8)
+
+class TestReadRecord(unittest.TestCase):
+    def test_reads_columns_with_one_pin_each(self):
+        db = Database(bufferpool_capacity=4)
+        table = db.create_table('Grades', 5, 0)
+        query = Query(table)
+        query.insert(1, 2, 3, 4, 5)
+        query.update(1, None, None, 30, None, None)
+
+        self.assertEqual(table.read_record("base", 0, 0, [4, 0, -3]), [5, 1, 0])
+        tail_idx, tail_pos = table.page_directory[table.read_record("base", 0, 0, [-1])[0]]
+        # Reads past the pool capacity fault the missing pages back in
+        self.assertEqual(table.read_record("tail", tail_idx, tail_pos, range(5)), [1, 2, 30, 4, 5])
+        self.assertTrue(all(page.pin_count == 0 for _, page in db.bufferpool.items()))
+
+    def test_page_evicted_before_the_pin_is_cached_again(self):
+        db = Database()
+        table = db.create_table('Grades', 5, 0)
+        Query(table).insert(1, 2, 3, 4, 5)
+        lookup = db.get_page_from_bufferpool
+
+        def lookup_then_evict(*key):
+            page = lookup(*key)
+            db.bufferpool.remove(key)
+            return page
+        db.get_page_from_bufferpool = lookup_then_evict
+        self.assertEqual(table.read_record("base", 0, 0, [0, 1]), [1, 2])
+        del db.get_page_from_bufferpool
+
+        # The pages the record was read from are the cached ones, later writes reach disk
+        for col_slot in (0, 1):
+            page = table.base_pages[0].columns[col_slot]
+            self.assertTrue(db.bufferpool.holds(('Grades', 'base', 0, col_slot), page))
+            self.assertEqual(page.pin_count, 0)
+
+class TestReplacementPolicies(unittest.TestCase):
+    def test_every_policy_respects_capacity_and_pins(self):
+        """Test that each policy keeps the pool bounded and never evicts a pinned page"""
+        for policy in POLICIES:
+            pool = BufferPool(20 * PAGE_SIZE, policy=policy)
+            pinned = Page()
+            pinned.pin()
+            pool.put(("Grades", "base", 0, 0), pinned)
+            for i in range(1, 200):
+                pool.put(("Grades", "base", i, 0), Page())
+                pool.get(("Grades", "base", i // 2, 0))
+                self.assertLessEqual(len(pool), 20, policy)
+            self.assertIn(("Grades", "base", 0, 0), pool, policy)
+
+    def test_scan_resistant_policies_keep_hot_pages(self):
+        """Test that a long scan does not flush pages that were requested repeatedly"""
+        for policy in ["2q", "arc"]:
+            pool = BufferPool(20 * PAGE_SIZE, policy=policy)
+            hot = [("Grades", "base", i, 0) for i in range(5)]
+            # Bring the hot pages in, push them out once and request them again
+            for round in range(3):
+                for key in hot:
+                    if pool.get(key) is None:
+                        pool.put(key, Page())
+                for i in range(100 * (round + 1), 100 * (round + 1) + 18):
+                    pool.put(("Grades", "base", i, 0), Page())
+            for key in hot:
+                if pool.get(key) is None:
+                    pool.put(key, Page())
+
+            for i in range(1000, 1200):
+                pool.put(("Grades", "base", i, 0), Page())
+            for key in hot:
+                self.assertIn(key, pool, policy)
+
+    def test_hit_ratio(self):
+        pool = BufferPool(20 * PAGE_SIZE, policy="clock")
+        pool.put(("Grades", "base", 0, 0), Page())
+        pool.get(("Grades", "base", 0, 0))
+        pool.get(("Grades", "base", 1, 0))
+        self.assertEqual(pool.hit_ratio(), 0.5)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            BufferPool(20 * PAGE_SIZE, policy="mru")
+
+class TestShardedBufferPool(unittest.TestCase):
+    def test_capacity_is_split_across_shards(self):
+        pool = ShardedBufferPool(100 * PAGE_SIZE, shards=8)
+        self.assertEqual(len(pool.shards), 8)
+        self.assertEqual(sum(shard.capacity_bytes for shard in pool.shards), 100 * PAGE_SIZE)
+
+    def test_pages_are_found_in_their_shard(self):
+        """Test that every cached page is found again and lives in exactly one shard"""
+        pool = ShardedBufferPool(100 * PAGE_SIZE, shards=8)
+        pages = {}
+        for i in range(50):
+            key = ("Grades", "base", i, i % 5)
+            pages[key] = Page()
+            pool.put(key, pages[key])
+        for key, page in pages.items():
+            self.assertIs(pool.get(key), page)
+            self.assertEqual(sum(key in shard for shard in pool.shards), 1)
+        self.assertEqual(len(pool), 50)
+        self.assertEqual(pool.hit_ratio(), 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch
+import tempfile
+import shutil
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lstore.db import Database
+from lstore.query import Query
+from lstore.catalog import load_catalog
+import lstore.catalog
+
+class TestCatalog(unittest.TestCase):
+    def test_round_trip(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database()
+            db.open(path)
+            table = db.create_table('Grades', 5, 0)
+            query = Query(table)
+            # More keys than a pickled OOBTree could hold before hitting the recursion limit
+            for i in range(20000):
+                query.insert(i, i, 1, 1, 1)
+            query.update(7, None, None, 5, None, None)
+            query.insert(-5, -2 ** 40, 1, 1, 1)
+            table.index.create_index(2)
+            table.index.create_index(1)
+            page_directory = dict(table.page_directory)
+            db.close()
+
+            db = Database()
+            db.open(path)
+            table = db.get_table('Grades')
+            self.assertEqual(table.page_directory, page_directory)
+            self.assertEqual((table.tid_counter, table.bid_counter), (3, 40002))
+            self.assertEqual(table.index.locate(2, 5), [14])
+            self.assertEqual(len(table.index.locate(2, 1)), 20000)
+            self.assertEqual(table.index.locate(0, -5), [40000])
+            self.assertEqual(table.index.locate(1, -2 ** 40), [40000])
+            self.assertIsNone(table.index.indices[3])
+            self.assertEqual(len(table.lock_map), 20001)
+            self.assertEqual(Query(table).select(7, 0, [1, 1, 1, 1, 1])[0].columns, [7, 7, 5, 1, 1])
+            db.close()
+
+            with open(os.path.join(path, 'Grades', 'catalog.bin'), 'r+b') as f:
+                f.write(b'XXXX')
+            with self.assertRaises(ValueError):
+                Database().open(path)
+
+            # A table saved before the catalog existed is refused rather than opened empty
+            os.remove(os.path.join(path, 'Grades', 'catalog.bin'))
+            with open(os.path.join(path, 'Grades', 'Grades.pkl'), 'wb') as f:
+                f.write(b'legacy')
+            with self.assertRaises(ValueError):
+                Database().open(path)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_index_changes_while_saving(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database()
+            db.open(path)
+            table = db.create_table('Grades', 3, 0)
+            query = Query(table)
+            values = {}
+            for i in range(10):
+                query.insert(i, i % 2, 0)
+                values[i] = i % 2
+            table.index.create_index(1)
+
+            # Every array written lets another record in, between the keys, run lengths
+            # and rids of an index as well
+            write_array = lstore.catalog._write_array
+
+            def write_array_then_insert(*args):
+                write_array(*args)
+                key = len(values)
+                query.insert(key, 0, 0)
+                values[key] = 0
+            with patch('lstore.catalog._write_array', write_array_then_insert):
+                db.save_table('Grades')
+
+            value_of = {table.index.locate(0, key)[0]: value for key, value in values.items()}
+            state = load_catalog(os.path.join(path, 'Grades', 'catalog.bin'))
+            for value, rids in state['indices'][1].items():
+                for rid in rids:
+                    self.assertEqual(value_of[rid], value)
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import random
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lstore.page import Page
+from lstore.config import PAGE_SIZE
+from lstore.encoding import RAW, RLE, DICT, FOR, DELTA
+
+class TestEncodings(unittest.TestCase):
+    def test_round_trip(self):
+        columns = {
+            RLE: [0] * 300 + [4] * 212,
+            DICT: [(i * 7919) % 5 * 10 ** 12 for i in range(512)],
+            FOR: [10 ** 12 + (i * 7919) % 200 for i in range(512)],
+            DELTA: list(range(10, 10 + 2 * 512, 2)),
+        }
+        for encoding, values in columns.items():
+            page = Page()
+            page.write_many(0, values)
+            page_encoding, data = page.encode()
+            self.assertEqual(page_encoding, encoding)
+            self.assertLess(len(data), PAGE_SIZE // 4)
+
+            loaded = Page()
+            loaded.load_bytes(data, page_encoding)
+            self.assertEqual(loaded.read_many(0, 512), values)
+            self.assertEqual(loaded.read(511), values[511])
+            self.assertEqual(loaded.read_many(290, 310), values[290:310])
+            self.assertEqual(loaded.size_bytes(), len(data))
+            # The first write turns the page back into plain values
+            loaded.write(1, 5)
+            self.assertEqual(loaded.read_many(4, 7), [values[4], 1, values[6]])
+            self.assertEqual(loaded.size_bytes(), PAGE_SIZE)
+
+        page = Page()
+        page.write_many(0, [random.Random(i).getrandbits(62) for i in range(512)])
+        self.assertEqual(page.encode()[0], RAW)
+
+if __name__ == '__main__':
+    unittest.main()
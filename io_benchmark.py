@@ -0,0 +1,39 @@
+from lstore.db import Database
+from lstore.query import Query
+from time import perf_counter
+import shutil
+
+# Time to checkpoint every page of freshly loaded tables and to open them again, lazily
+# and with every page loaded up front, for a growing number of I/O worker threads.
+path = './ECS165_io'
+number_of_tables = 8
+number_of_records = 3000
+number_of_columns = 40
+
+for io_threads in [1, 4, 8]:
+    shutil.rmtree(path, ignore_errors=True)
+    db = Database(bufferpool_capacity=100000, io_threads=io_threads)
+    db.open(path)
+    for t in range(0, number_of_tables):
+        query = Query(db.create_table(f'Grades{t}', number_of_columns, 0))
+        for i in range(0, number_of_records):
+            query.insert(906659671 + i, *range(1, number_of_columns))
+    time_0 = perf_counter()
+    written = db.checkpoint()
+    time_1 = perf_counter()
+    db.close()
+    print(f"{io_threads} I/O thread(s): checkpoint of {written} pages\t{time_1 - time_0:.2f} seconds")
+
+    db = Database(bufferpool_capacity=100000, io_threads=io_threads)
+    time_0 = perf_counter()
+    db.open(path)
+    time_1 = perf_counter()
+    db.close()
+    db = Database(bufferpool_capacity=100000, io_threads=io_threads)
+    time_2 = perf_counter()
+    db.open(path, lazy=False)
+    time_3 = perf_counter()
+    print(f"{io_threads} I/O thread(s): lazy open\t{time_1 - time_0:.2f} seconds, full open\t{time_3 - time_2:.2f} seconds ({db.stats()['pages_read']} pages)")
+    db.close()
+
+shutil.rmtree(path, ignore_errors=True)
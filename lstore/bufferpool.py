@@ -0,0 +1,311 @@
+from .replacement import make_policy
+from .config import PAGE_SIZE
+import threading
+
+"""
+Resident byte counter for one buffer pool, shared by all of its shards
+"""
+class MemoryAccount:
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.resident_bytes = 0
+        self.peak_resident_bytes = 0
+        self.lock = threading.Lock()
+
+    def charge(self, nbytes):
+        with self.lock:
+            self.resident_bytes += nbytes
+            if self.resident_bytes > self.peak_resident_bytes:
+                self.peak_resident_bytes = self.resident_bytes
+
+    def release(self, nbytes):
+        with self.lock:
+            self.resident_bytes -= nbytes
+
+    def reset_peak(self):
+        with self.lock:
+            self.peak_resident_bytes = self.resident_bytes
+
+
+"""
+Page cache shared by every table of a Database. Pages are keyed by
+(table_name, page_type, page_index, col_index). Which page to evict is decided by a
+replacement policy from lstore.replacement ("lru", "clock", "2q" or "arc"), chosen
+at construction. Every policy keeps its queues in OrderedDicts, so a hit, an insert
+and an eviction are O(1) no matter how large the pool is.
+
+The pool is sized in bytes: every page is charged Page.size_bytes() from the moment it
+is cached until it is evicted and, if dirty, written back. Current and peak resident
+bytes are kept in a MemoryAccount, which the shards of a ShardedBufferPool share.
+
+Pinned pages (pin_count > 0) are never chosen as victims. Dirty victims are parked
+in writeback until the caller has written them out, so a lookup that races with the
+write-back gets the in-memory page back instead of reading a stale copy from disk.
+"""
+class BufferPool:
+
+    def __init__(self, capacity_bytes=1000 * PAGE_SIZE, policy="lru", account=None, page_size=PAGE_SIZE):
+        self.capacity_bytes = capacity_bytes  # Budget for the pages held at once, in bytes
+        self.capacity = max(capacity_bytes // page_size, 1)  # Same budget in full-size pages
+        self.pages = {}
+        self.sizes = {}  # Bytes charged for each resident or writeback page
+        self.resident_bytes = 0
+        self.writeback_bytes = 0  # Part of resident_bytes that is already on its way out
+        self.account = account if account is not None else MemoryAccount(capacity_bytes)
+        self.policy = make_policy(policy, self.capacity)
+        self.writeback = {}  # Dirty victims not yet written to disk
+        self.lock = threading.RLock()
+        # Evict 10% of pages at once (at most 50, at least 1) so a full pool
+        # does not pay for an eviction on every insert
+        self.evict_batch = max(min(int(self.capacity * 0.1), 50), 1)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __contains__(self, key):
+        return key in self.pages
+
+    """
+    # Returns the cached page for key and marks it most recently used, or None on a miss
+    """
+    def get(self, key):
+        with self.lock:
+            page = self.pages.get(key)
+            if page is not None:
+                self.hits += 1
+                self.policy.hit(key)
+                return page
+
+            page = self.writeback.get(key)
+            if page is not None:
+                # Evicted but still being written back, bring it straight back in
+                # It was never released from the budget, so nothing is charged here
+                self.hits += 1
+                del self.writeback[key]
+                self.writeback_bytes -= self.sizes[key]
+                self.policy.insert(key)
+                self.pages[key] = page
+                return page
+
+            self.misses += 1
+            return None
+
+    """
+    # Caches page under key, evicting batches of unpinned pages until it fits the budget
+    # Returns (resident page, [(key, page), ...] of evicted pages)
+    # If key is already cached the resident page wins and is only touched, the same goes
+    # for a page of key that is still being written back, which is taken back in
+    # Dirty evicted pages must be handed to writeback_done once written
+    """
+    def put(self, key, page):
+        with self.lock:
+            resident = self.pages.get(key)
+            if resident is not None:
+                self.policy.hit(key)
+                return resident, []
+
+            resident = self.writeback.pop(key, None)
+            if resident is not None:
+                # Still charged, see get
+                self.writeback_bytes -= self.sizes[key]
+                self.policy.insert(key)
+                self.pages[key] = resident
+                return resident, []
+
+            # The policy sees the key before eviction so ghost hits can steer the victims
+            self.policy.insert(key)
+            size = page.size_bytes()
+            evicted = []
+            # Pages waiting to be written back are already leaving, so the budget may be
+            # exceeded by at most one eviction batch until their writes complete
+            while self.resident_bytes - self.writeback_bytes + size > self.capacity_bytes:
+                batch = self._evict(self.evict_batch)
+                if not batch:
+                    break
+                evicted.extend(batch)
+
+            self.pages[key] = page
+            self._charge(key, size)
+            return page, evicted
+
+    """
+    # Caches page under key in place of whatever page key held, resident or waiting for
+    # writeback. Returns the evicted pages like put. The page it replaces is forgotten,
+    # it lives on only as long as some reader still holds it
+    """
+    def replace(self, key, page):
+        with self.lock:
+            if key in self.pages:
+                self.policy.remove(key)
+                # Readers may still hold the old page while the new one is written to its slot
+                self.pages.pop(key).detach()
+                self._release(key)
+            elif key in self.writeback:
+                # writeback_done will not find the old page anymore, so settle its bytes now
+                self.writeback.pop(key).detach()
+                self.writeback_bytes -= self.sizes[key]
+                self._release(key)
+            return self.put(key, page)[1]
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    """
+    # Removes up to count unpinned pages, least recently used first
+    # If every page is pinned nothing is evicted and the pool runs over capacity
+    # until pages are unpinned, rather than stalling the caller
+    """
+    def _evict(self, count):
+        def is_pinned(key):
+            page = self.pages.get(key)
+            return page is None or page.pin_count > 0
+
+        evicted = []
+        for key in self.policy.evict(count, is_pinned):
+            page = self.pages.pop(key)
+            if page.is_dirty:
+                # Still in memory until written, so it stays charged until writeback_done
+                self.writeback[key] = page
+                self.writeback_bytes += self.sizes[key]
+            else:
+                self._release(key)
+            evicted.append((key, page))
+        return evicted
+
+    def _charge(self, key, size):
+        self.sizes[key] = size
+        self.resident_bytes += size
+        self.account.charge(size)
+
+    def _release(self, key):
+        size = self.sizes.pop(key, 0)
+        self.resident_bytes -= size
+        self.account.release(size)
+
+    """
+    # Called once an evicted page has been written to disk
+    """
+    def writeback_done(self, key, page):
+        with self.lock:
+            if self.writeback.get(key) is page:
+                del self.writeback[key]
+                self.writeback_bytes -= self.sizes[key]
+                self._release(key)
+
+    """
+    # Drops key from the pool without writing it back, returns the page or None
+    """
+    def remove(self, key):
+        with self.lock:
+            self.policy.remove(key)
+            page = self.pages.pop(key, None)
+            if page is not None:
+                self._release(key)
+            return page
+
+    """
+    # True if page is the page cached under key. Taken under the lock, so a page pinned
+    # before asking is either still cached or was evicted before the pin
+    """
+    def holds(self, key, page):
+        with self.lock:
+            return self.pages.get(key) is page
+
+    def items(self):
+        with self.lock:
+            return list(self.pages.items())
+
+    """
+    # Returns [(key, page), ...] of the resident dirty pages, oldest first
+    """
+    def dirty_pages(self):
+        with self.lock:
+            return [(key, page) for key, page in self.pages.items() if page.is_dirty]
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+
+"""
+BufferPool split into independent shards, each with its own lock, replacement policy
+and share of the capacity. A page always lives in the shard picked by the hash of its
+key, so threads touching unrelated pages rarely wait on the same lock. The byte budget
+is split evenly between shards. Offers the same interface as BufferPool.
+"""
+class ShardedBufferPool:
+
+    def __init__(self, capacity_bytes=1000 * PAGE_SIZE, policy="lru", shards=8, page_size=PAGE_SIZE):
+        shards = max(min(shards, capacity_bytes // page_size), 1)
+        self.capacity_bytes = capacity_bytes
+        self.account = MemoryAccount(capacity_bytes)
+        per_shard, extra = divmod(capacity_bytes, shards)
+        self.shards = [BufferPool(per_shard + (1 if i < extra else 0), policy, self.account, page_size) for i in range(shards)]
+
+    def shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def __contains__(self, key):
+        return key in self.shard(key)
+
+    def get(self, key):
+        return self.shard(key).get(key)
+
+    def put(self, key, page):
+        return self.shard(key).put(key, page)
+
+    def replace(self, key, page):
+        return self.shard(key).replace(key, page)
+
+    def writeback_done(self, key, page):
+        self.shard(key).writeback_done(key, page)
+
+    def remove(self, key):
+        return self.shard(key).remove(key)
+
+    def holds(self, key, page):
+        return self.shard(key).holds(key, page)
+
+    def items(self):
+        items = []
+        for shard in self.shards:
+            items.extend(shard.items())
+        return items
+
+    def dirty_pages(self):
+        dirty = []
+        for shard in self.shards:
+            dirty.extend(shard.dirty_pages())
+        return dirty
+
+    @property
+    def hits(self):
+        return sum(shard.hits for shard in self.shards)
+
+    @property
+    def misses(self):
+        return sum(shard.misses for shard in self.shards)
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def resident_bytes(self):
+        return self.account.resident_bytes
+
+    @property
+    def peak_resident_bytes(self):
+        return self.account.peak_resident_bytes
+
+    def reset_stats(self):
+        for shard in self.shards:
+            shard.reset_stats()
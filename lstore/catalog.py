@@ -0,0 +1,192 @@
+from array import array
+from BTrees.OOBTree import OOBTree
+import gc
+import itertools
+import os
+import struct
+import sys
+from .config import PAGE_SIZE, RECORD_SIZE, BASE_PAGES_PER_RANGE
+from .zonemap import ZoneMap
+from .page_directory import PageDirectory
+
+"""
+Binary table catalog, saved as <table>/catalog.bin in place of a pickle of the table.
+Everything but the name is a fixed-width little-endian integer, and the bulk of the
+catalog is a handful of arrays that are read and written with one call each:
+
+    header          magic, version, key, num_columns, tid_counter, bid_counter,
+                    num_base_pages, num_tail_pages, updates
+    name            byte length, UTF-8 bytes
+    geometry        page size, base pages per page range (version 2 on)
+    page manifest   num_records of every base page, then of every tail page
+    page ranges     owning page range of every tail page (-1 when shared, -2 once
+                    reclaimed and free for reuse, version 6 on), then the updates since
+                    the last merge of every page range (version 5 on)
+    zone map        live records of every base page, then the column minimums and the
+                    column maximums of all base pages, page after page (version 3 on)
+    page directory  packed locations of the base rids, then the first tail rid kept
+                    (version 6 on) and the packed locations of the tail rids, as kept by
+                    PageDirectory (versions 1 to 3: rids, page indices and positions
+                    in page as three parallel arrays)
+    indices         indexed column numbers, then for each of them the sorted keys,
+                    the number of rids per key and all rids key after key
+
+Every array is stored as its element count followed by the elements. Older catalogs
+load with the default geometry (version 1), without a zone map (versions 1 and 2),
+which Database.open then rebuilds from the pages, and with all tail pages shared
+between page ranges (versions 1 to 4). Unknown versions raise ValueError.
+"""
+
+MAGIC = b"LSTC"
+VERSION = 6
+HEADER = struct.Struct("<4sIqqqqqqq")
+GEOMETRY = struct.Struct("<qq")
+COUNT = struct.Struct("<Q")
+
+def save_catalog(path, state):
+    # Written next to the old catalog and renamed over it once complete
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, state['key'], state['num_columns'], state['tid_counter'],
+                            state['bid_counter'], state['num_base_pages'], state['num_tail_pages'],
+                            state['updates']))
+        name = state['name'].encode("utf-8")
+        f.write(COUNT.pack(len(name)))
+        f.write(name)
+        f.write(GEOMETRY.pack(state['page_size'], state['base_pages_per_range']))
+
+        _write_array(f, 'q', state['page_manifest']['base'])
+        _write_array(f, 'q', state['page_manifest']['tail'])
+
+        _write_array(f, 'q', state['tail_page_ranges'])
+        _write_array(f, 'q', state['range_updates'])
+
+        zone_map = state['zone_map']
+        _write_array(f, 'q', zone_map.counts)
+        _write_array(f, 'q', itertools.chain.from_iterable(zone_map.mins))
+        _write_array(f, 'q', itertools.chain.from_iterable(zone_map.maxs))
+
+        page_directory = state['page_directory']
+        tail_start, tail = page_directory.tail_window
+        _write_array(f, 'q', page_directory.base)
+        f.write(COUNT.pack(tail_start))
+        _write_array(f, 'q', tail)
+
+        indexed = [column for column, tree in enumerate(state['indices']) if tree is not None]
+        _write_array(f, 'q', indexed)
+        for column in indexed:
+            # One snapshot, so keys and rids line up even if the tree changes meanwhile
+            items = list(state['indices'][column].items())
+            _write_array(f, 'q', (key for key, _ in items))
+            _write_array(f, 'q', (len(rids) for _, rids in items))
+            _write_array(f, 'q', itertools.chain.from_iterable(rids for _, rids in items))
+    os.replace(path + ".tmp", path)
+
+"""
+# Returns the table state saved by save_catalog, in the form Table.get_table_stats returns it
+"""
+def load_catalog(path):
+    # Millions of small lists are created here and none of them can be garbage yet,
+    # collections while loading would only walk them over and over
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _load_catalog(path)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+def _load_catalog(path):
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"Truncated catalog {path}")
+        (magic, version, key, num_columns, tid_counter, bid_counter,
+         num_base_pages, num_tail_pages, updates) = HEADER.unpack(header)
+        if magic != MAGIC or version not in (1, 2, 3, 4, 5, VERSION):
+            raise ValueError(f"Unsupported catalog {path}: {magic!r} version {version}")
+        name = f.read(COUNT.unpack(f.read(COUNT.size))[0]).decode("utf-8")
+        page_size, base_pages_per_range = PAGE_SIZE, BASE_PAGES_PER_RANGE
+        if version >= 2:
+            page_size, base_pages_per_range = GEOMETRY.unpack(f.read(GEOMETRY.size))
+
+        page_manifest = {'base': _read_array(f, 'q').tolist(), 'tail': _read_array(f, 'q').tolist()}
+
+        tail_page_ranges, range_updates = None, None
+        if version >= 5:
+            tail_page_ranges = _read_array(f, 'q').tolist()
+            range_updates = _read_array(f, 'q').tolist()
+
+        zone_map = None
+        if version >= 3:
+            counts = _read_array(f, 'q').tolist()
+            mins = _read_array(f, 'q').tolist()
+            maxs = _read_array(f, 'q').tolist()
+            zone_map = ZoneMap.from_pages(num_columns, base_pages_per_range, mins, maxs, counts)
+
+        if version >= 6:
+            base = _read_array(f, 'q')
+            tail_start = COUNT.unpack(f.read(COUNT.size))[0]
+            page_directory = PageDirectory(page_size // RECORD_SIZE, base, _read_array(f, 'q'), tail_start=tail_start)
+        elif version >= 4:
+            page_directory = PageDirectory(page_size // RECORD_SIZE, _read_array(f, 'q'), _read_array(f, 'q'))
+        else:
+            page_directory = PageDirectory(page_size // RECORD_SIZE)
+            rids = _read_array(f, 'q')
+            page_indices = _read_array(f, 'q')
+            positions = _read_array(f, 'q')
+            for rid, page_index, position in zip(rids, page_indices, positions):
+                page_directory[rid] = (page_index, position)
+
+        indices = [None] * num_columns
+        for column in _read_array(f, 'q').tolist():
+            # Keys are signed like every column value. Catalogs written with unsigned keys
+            # read the same, they could not hold negative keys
+            keys = _read_array(f, 'q').tolist()
+            run_lengths = _read_array(f, 'q').tolist()
+            all_rids = _read_array(f, 'q').tolist()
+            if len(all_rids) == len(keys) and max(run_lengths, default=0) <= 1:
+                # One rid per key, as in the primary key index
+                runs = list(map(list, zip(all_rids)))
+            else:
+                runs = []
+                start = 0
+                for length in run_lengths:
+                    runs.append(all_rids[start:start + length])
+                    start += length
+            tree = OOBTree()
+            tree.update(list(zip(keys, runs)))
+            indices[column] = tree
+
+    return {
+        'name': name,
+        'key': key,
+        'num_columns': num_columns,
+        'tid_counter': tid_counter,
+        'bid_counter': bid_counter,
+        'page_directory': page_directory,
+        'indices': indices,
+        'num_base_pages': num_base_pages,
+        'num_tail_pages': num_tail_pages,
+        'updates': updates,
+        'tail_page_ranges': tail_page_ranges,
+        'range_updates': range_updates,
+        'zone_map': zone_map,
+        'page_size': page_size,
+        'base_pages_per_range': base_pages_per_range,
+        'page_manifest': page_manifest,
+    }
+
+def _write_array(f, typecode, values):
+    values = array(typecode, values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    f.write(COUNT.pack(len(values)))
+    values.tofile(f)
+
+def _read_array(f, typecode):
+    count = COUNT.unpack(f.read(COUNT.size))[0]
+    values = array(typecode)
+    values.fromfile(f, count)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
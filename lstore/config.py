@@ -2,4 +2,29 @@ INDIRECTION_COLUMN = -1
 RID_COLUMN = -2
 TIMESTAMP_COLUMN = -3
 SCHEMA_ENCODING_COLUMN = -4
-MAX_VERSIONS = 1000
\ No newline at end of file
+MAX_VERSIONS = 1000
+PAGE_SIZE = 4096  # Bytes per physical page, default for new tables
+RECORD_SIZE = 8  # Bytes per value, every column is a 64-bit integer
+RECORDS_PER_PAGE = PAGE_SIZE // RECORD_SIZE
+BASE_PAGES_PER_RANGE = 16  # Base pages grouped into one PageRange
+IO_BATCH_PAGES = 64  # Pages per batch handed to an I/O worker by checkpoint and open
+CATALOG_FILE = "catalog.bin"  # Table metadata file in each table directory
+MERGE_CHAIN_LENGTH = 3.0  # Tail records per base record of a page range that make it due for a merge
+MERGE_MODES = ("thread", "process")  # Where a merge consolidates its page ranges
+MERGE_PROCESSES = 2  # Worker processes shared by the merges of every table in "process" mode
+
+
+"""
+# Page layout of one table. Every size that depends on the page size is derived here
+:param page_size: int               #Bytes per physical page, a multiple of RECORD_SIZE
+:param base_pages_per_range: int    #Base pages grouped into one PageRange
+"""
+class PageGeometry:
+    def __init__(self, page_size=PAGE_SIZE, base_pages_per_range=BASE_PAGES_PER_RANGE):
+        if page_size < RECORD_SIZE or page_size % RECORD_SIZE != 0:
+            raise ValueError(f"Page size must be a positive multiple of {RECORD_SIZE} bytes, got {page_size}")
+        if base_pages_per_range < 1:
+            raise ValueError(f"A page range needs at least one base page, got {base_pages_per_range}")
+        self.page_size = page_size
+        self.records_per_page = page_size // RECORD_SIZE
+        self.base_pages_per_range = base_pages_per_range
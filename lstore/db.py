@@ -1,75 +1,194 @@
-from .table import Table, LogicalPage, ReadWriteLockNoWait
+from .table import Table, LogicalPage, ReadWriteLockNoWait, shutdown_merge_process_pool
 import os
-import pickle
 from .page import Page
+from .bufferpool import ShardedBufferPool
+from .config import PAGE_SIZE, BASE_PAGES_PER_RANGE, IO_BATCH_PAGES, CATALOG_FILE, MERGE_MODES, PageGeometry
+from .flusher import PageFlusher
+from .readahead import ReadAhead
+from .stats import IOStats
+from .segment import SegmentFile
+from .catalog import save_catalog, load_catalog
+from .encoding import RAW
 import pdb
 import threading
+import time
+import concurrent.futures
 
 db_instance = None
 
 class Database():
-    def __init__(self):
+    def __init__(self, bufferpool_capacity=1000, bufferpool_policy="lru", bufferpool_shards=8, bufferpool_bytes=None,
+                 dirty_high_watermark=0.5, dirty_low_watermark=0.25, read_ahead_pages=8, mmap_pages=False,
+                 io_threads=8, page_size=PAGE_SIZE, base_pages_per_range=BASE_PAGES_PER_RANGE, merge_mode="thread"):
+        if merge_mode not in MERGE_MODES:
+            raise ValueError(f"Merge mode must be one of {', '.join(MERGE_MODES)}, got {merge_mode!r}")
         self.tables = {}
-        self.bufferpool = {}  # Dictionary mapping (table_name, page_type, page_index, col_index) to Page objects
-        self.bufferpool_capacity = 1000  # Maximum number of pages in buffer pool
-        self.bufferpool_lru = []  # Keep track of least recently used pages
-        self.bufferpool_lock = threading.RLock()  # Thread-safe access to buffer pool
+        # Page geometry of the tables created here unless create_table overrides it,
+        # tables opened from disk keep the geometry they were created with
+        self.geometry = PageGeometry(page_size, base_pages_per_range)
+        # "thread" consolidates merges on the merge thread, "process" ships snapshots of
+        # the page ranges to worker processes so merges do not hold the GIL for long.
+        # Workers import the main script again, it needs an if __name__ == "__main__" guard
+        self.merge_mode = merge_mode
+        self.bufferpool_capacity = bufferpool_capacity  # Maximum number of full-size pages in buffer pool
+        # Memory budget of the buffer pool, defaults to bufferpool_capacity pages
+        self.bufferpool_bytes = bufferpool_bytes if bufferpool_bytes is not None else bufferpool_capacity * page_size
+        # Maps (table_name, page_type, page_index, col_index) to Page objects
+        # bufferpool_policy picks the replacement policy: "lru", "clock", "2q" or "arc"
+        # The pool is split into bufferpool_shards shards, each with its own lock
+        self.bufferpool = ShardedBufferPool(self.bufferpool_bytes, bufferpool_policy, bufferpool_shards, page_size)
+        self.io_stats = IOStats()  # Per-table counters behind stats()
+        # Background writer started by open(), keeps the dirty share of the pool
+        # between dirty_low_watermark and dirty_high_watermark of bufferpool_bytes
+        self.dirty_high_watermark = dirty_high_watermark
+        self.dirty_low_watermark = dirty_low_watermark
+        self.flusher = None
+        # Background loader started by open(), keeps read_ahead_pages pages loaded ahead
+        # of sequential readers, 0 turns read-ahead off
+        self.read_ahead_pages = read_ahead_pages
+        self.read_ahead = None
+        # With mmap_pages, loaded pages are read-only views into the mapped segment files:
+        # reads decode in place, clean pages are evicted without copying anything, and
+        # processes opening the same directory share the OS page cache
+        self.mmap_pages = mmap_pages
+        # Workers started by open() for checkpoint and eager-open page I/O, which is
+        # dispatched in batches of IO_BATCH_PAGES pages. 1 keeps all I/O on the caller
+        self.io_threads = io_threads
+        self.io_pool = None
+        # One segment file per (table_name, page_type), opened on first use
+        self.segments = {}
+        self.segments_lock = threading.Lock()
         self.path = ""
 
         global db_instance
         db_instance = self
 
     def get_page_from_bufferpool(self, table_name, page_type, page_index, col_index):
-        """Retrieve a page from the buffer pool if it exists with faster lookup"""
-        key = (table_name, page_type, page_index, col_index)
-        with self.bufferpool_lock:
-            if key in self.bufferpool:
-                # Move to end of LRU list without removing first (more efficient)
-                try:
-                    self.bufferpool_lru.remove(key)
-                except ValueError:
-                    # Handle case where key might not be in LRU
-                    pass
-                self.bufferpool_lru.append(key)
-                return self.bufferpool[key]
-            return None
+        """Retrieve a page from the buffer pool if it exists"""
+        return self.bufferpool.get((table_name, page_type, page_index, col_index))
 
     def add_page_to_bufferpool(self, table_name, page_type, page_index, col_index, page):
-        """Add a page to the buffer pool, evicting LRU page if necessary"""
-        if page is None or col_index < 0:
+        """Add a page to the buffer pool, evicting pages if it is over its memory budget"""
+        if page is None:
             return None
-    
+
         key = (table_name, page_type, page_index, col_index)
-        with self.bufferpool_lock:
-            # Check if page is already in buffer pool
-            if key in self.bufferpool:
-                # Just update the LRU position
-                try:
-                    self.bufferpool_lru.remove(key)
-                except ValueError:
-                    pass
-                self.bufferpool_lru.append(key)
-                return self.bufferpool[key]
-            # If buffer pool is full, evict least recently used page
-            if len(self.bufferpool) >= self.bufferpool_capacity:
-                # Evict 10% of pages at once for better performance
-                evict_count = min(int(self.bufferpool_capacity * 0.1), 50)
-                evict_count = max(evict_count, 1)  # Ensure at least one page is evicted
-                
-                # Batch evict pages
-                for _ in range(evict_count):
-                    if not self.bufferpool_lru:
-                        break
-                lru_key = self.bufferpool_lru.pop(0)
-                evicted_page = self.bufferpool.pop(lru_key)
-                if evicted_page.is_dirty:
-                    # Write dirty page to disk
-                    self._write_page_to_disk(lru_key[0], lru_key[1], lru_key[2], lru_key[3], evicted_page)
-            
-            # Add new page to buffer pool
-            self.bufferpool[key] = page
-            self.bufferpool_lru.append(key)
-            return page
+        page, evicted = self.bufferpool.put(key, page)
+        # Dirty victims are written after put has released the buffer pool lock
+        if self.flusher is not None and any(evicted_page.is_dirty for _, evicted_page in evicted):
+            # The flusher is falling behind, wake it up now
+            self.flusher.wakeup.set()
+        self._write_back(evicted)
+        return page
+
+    def _write_back(self, evicted):
+        """Write evicted dirty pages to disk, must be called without holding a shard lock"""
+        for lru_key, evicted_page in evicted:
+            table_name, page_type, page_index, col_index = lru_key
+            counters = self.io_stats.table(table_name)
+            counters.evictions += 1
+            # Drop the table's own reference too, otherwise the page stays in memory
+            table = self.tables.get(table_name)
+            if table is not None:
+                table.release_page(page_type, page_index, col_index, evicted_page)
+            if evicted_page.is_dirty:
+                counters.writebacks += 1
+                self._write_page_to_disk(table_name, page_type, page_index, col_index, evicted_page)
+            self.bufferpool.writeback_done(lru_key, evicted_page)
+
+    def _write_resident_page(self, key, page):
+        """
+        Write a page that stays in memory, pinned for the whole write so it cannot be
+        evicted, and read back from disk, while the data is still on its way there.
+        Returns False if the page was dropped before the pin, whoever dropped it wrote it
+        """
+        table_name, page_type, page_index, col_index = key
+        table = self.tables.get(table_name)
+        if table is None:
+            return False
+        logical_pages = table._logical_pages(page_type)
+        if page_index >= len(logical_pages) or logical_pages[page_index] is None:
+            return False
+        logical_page = logical_pages[page_index]
+        with logical_page.PinLock:
+            page.pin()
+            attached = logical_page.columns[col_index] is page
+        try:
+            # Eviction checks pins and drops the page under the shard lock, so a page still
+            # cached now stays cached until the unpin
+            if not attached and not self.bufferpool.holds(key, page):
+                return False
+            if not page.is_dirty:
+                return False
+            self._write_page_to_disk(table_name, page_type, page_index, col_index, page)
+            return True
+        finally:
+            with logical_page.PinLock:
+                page.unpin()
+
+    def replace_page_in_bufferpool(self, table_name, page_type, page_index, col_index, page):
+        """Swap a new version of a page into the buffer pool, see BufferPool.replace"""
+        evicted = self.bufferpool.replace((table_name, page_type, page_index, col_index), page)
+        self._write_back(evicted)
+
+    def on_page_access(self, table_name, page_type, page_index, col_index):
+        """Feed an access to sequential read-ahead detection"""
+        if self.read_ahead is not None:
+            self.read_ahead.on_access(table_name, page_type, page_index, col_index)
+
+    def hint_sequential(self, table_name, page_type, col_index, start_page=0):
+        """Announce a walk over one column's pages in order, starting at start_page"""
+        if self.read_ahead is not None:
+            self.read_ahead.hint(table_name, page_type, col_index, start_page)
+
+    def stats(self):
+        """
+        Buffer pool and I/O counters since the last reset_stats(), summed over all tables,
+        plus the current residency. 'tables' holds the same breakdown for each table
+        """
+        totals, per_table = self.io_stats.snapshot()
+        residency = {}
+        for (table_name, _, _, _), page in self.bufferpool.items():
+            pages, nbytes = residency.get(table_name, (0, 0))
+            residency[table_name] = (pages + 1, nbytes + page.size_bytes())
+
+        for table_name, table_stats in per_table.items():
+            table_stats['resident_pages'], table_stats['resident_bytes'] = residency.get(table_name, (0, 0))
+        totals['resident_pages'] = len(self.bufferpool)
+        totals.update(self.memory_usage())
+        totals['tables'] = per_table
+        return totals
+
+    def reset_stats(self):
+        self.io_stats.reset()
+        self.bufferpool.reset_stats()
+
+    def memory_usage(self):
+        """Current and peak bytes held by the buffer pool against its budget"""
+        return {
+            'budget_bytes': self.bufferpool_bytes,
+            'resident_bytes': self.bufferpool.resident_bytes,
+            'peak_resident_bytes': self.bufferpool.peak_resident_bytes,
+        }
+
+    def _segment(self, table_name, page_type, create=True):
+        """Segment file holding the page_type pages of table_name, None if it does not exist and create is False"""
+        key = (table_name, page_type)
+        segment = self.segments.get(key)
+        if segment is not None:
+            return segment
+        with self.segments_lock:
+            segment = self.segments.get(key)
+            if segment is None:
+                table_path = os.path.join(self.path, table_name)
+                segment_path = os.path.join(table_path, f"{page_type}.seg")
+                if not create and not os.path.exists(segment_path):
+                    return None
+                os.makedirs(table_path, exist_ok=True)
+                table = self.tables[table_name]
+                segment = SegmentFile(segment_path, table.num_columns + 4, table.geometry.page_size)
+                self.segments[key] = segment
+        return segment
 
     def _write_page_to_disk(self, table_name, page_type, page_index, col_index, page):
         """Write a page to disk"""
@@ -77,110 +196,133 @@ class Database():
         if page is None:
             print(f"Warning: Attempted to write a None page to disk for {table_name}, {page_type}, {page_index}, {col_index}")
             return
-            
-        table_path = os.path.join(self.path, table_name)
-        if not os.path.exists(table_path):
-            os.makedirs(table_path)
-        
-        folder_name = f"{page_type}_{page_index}"
-        folder_path = os.path.join(table_path, folder_name)
-        if not os.path.exists(folder_path):
-            os.makedirs(folder_path)
-        
-        # Write both the data file and the pkl file with metadata
-        data_file = os.path.join(folder_path, f"page_{col_index}.dat")
-        pkl_file = os.path.join(folder_path, f"page_{col_index}.pkl")
-        
-        with open(data_file, "wb") as f:
-            f.write(page.data)
-        with open(pkl_file, "wb") as f:
-            pickle.dump(page.num_records, f)
-        
-        # Reset dirty flag
+
+        # Reset dirty flag before taking the snapshot, so a write that lands
+        # while the snapshot is on its way to disk marks the page dirty again
         page.is_dirty = False
+        dirty_records, page.dirty_map = page.dirty_map, set()
+        num_records = page.num_records
+        if page.cold:
+            # Written whole, in the smallest encoding
+            encoding, data = page.encode()
+            start, length = 0, len(data)
+        else:
+            # Only the span of records written since the last write-back, the rest of the
+            # page is already on disk. Without a dirty_map the whole page is written
+            encoding, length = RAW, page.size_bytes()
+            start, end = 0, len(page.data)
+            if dirty_records:
+                start, end = min(dirty_records), max(dirty_records) + 1
+            data = page.to_bytes(start, end)
+
+        self._segment(table_name, page_type).write_page(page_index, col_index, data, num_records, start * 8,
+                                                         length, encoding)
+        self.io_stats.table(table_name).record_write(len(data))
 
-    def open(self, path):
+    """
+    # Opens the database at path. With lazy=True (the default) only the table metadata
+    # and page manifest are read and every page is faulted in on first access, so open
+    # time grows with the number of tables rather than pages. lazy=False loads all pages
+    # up front as well
+    """
+    def open(self, path, lazy=True):
         global db_instance
         db_instance = self
 
         self.path = path
+        if self.flusher is None:
+            self.flusher = PageFlusher(self, self.dirty_high_watermark, self.dirty_low_watermark)
+            self.flusher.start()
+        if self.read_ahead is None and self.read_ahead_pages > 0:
+            self.read_ahead = ReadAhead(self, self.read_ahead_pages)
+            self.read_ahead.start()
+        if self.io_pool is None and self.io_threads > 1:
+            self.io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.io_threads)
         if not os.path.exists(self.path):
             return
 
+        loaded_tables = []
         for table_name in os.listdir(self.path):
             tablepath = os.path.join(self.path, table_name)
             if not os.path.isdir(tablepath):
                 continue
+            if not os.path.isfile(os.path.join(tablepath, CATALOG_FILE)):
+                if not os.listdir(tablepath):
+                    continue
+                # Tables saved before the catalog (pickled state and base_N/tail_N page
+                # folders) or never closed cannot be read, opening them empty would lose them
+                raise ValueError(f"Table {table_name} in {self.path} has no {CATALOG_FILE}, it was "
+                                 f"saved in an unsupported format or the database was not closed")
             
             table = self.load_table(table_name) 
-            table_history = self.load_page_histories(table_name)
-            
-            # Initialize base_pages list with the correct size
+            # Register the table first so pages evicted while loading release their references
+            self.tables[table_name] = table
+
+            manifest = table.page_manifest
+            if manifest is None:
+                # Saved before the manifest existed, rebuild it from the page headers
+                manifest = self._manifest_from_segments(table)
+            table.page_manifest = None
+
             table.base_pages = [None] * table.num_base_pages
-            
-            for index in range(0, table.num_base_pages):
-                if index not in table_history["base"]:
-                    continue
-                    
-                numrecords_list = table_history["base"][index]
-                base_path = os.path.join(tablepath, f"base_{index}")
-                base_page = LogicalPage(table)
-                
-                # Load column data for this base page
-                for col_index in range(min(len(numrecords_list), table.num_columns + 4)): 
-                    numrecords = numrecords_list[col_index]
-                    if os.path.exists(base_path):
-                        page_filepath = os.path.join(base_path, f"page_{col_index}.dat")
-                        if os.path.exists(page_filepath):
-                            # Actively load the page data from disk instead of just creating placeholder
-                            page = self._load_page_if_needed(table_name, "base", index, col_index)
-                            if page:
-                                base_page.columns[col_index] = page
-                                # Add to buffer pool
-                                self.add_page_to_bufferpool(table_name, "base", index, col_index, page)
-                
-                # Set the correct number of records for this page
-                base_page.num_records = max(numrecords_list) if numrecords_list else 0
-                
-                # Ensure key column is loaded to set up lock_map
-                key_page = self._load_page_if_needed(table_name, "base", index, table.key)
-                if key_page:
-                    base_page.columns[table.key] = key_page
-                    for x in range(key_page.num_records):
-                        key_value = key_page.read(x)
-                        if key_value not in table.lock_map:
-                            table.lock_map[key_value] = ReadWriteLockNoWait()
-                
-                # Store the base page at the correct index
+            for index, num_records in enumerate(manifest["base"][:table.num_base_pages]):
+                base_page = LogicalPage(table, loaded=False)
+                base_page.num_records = num_records
                 table.base_pages[index] = base_page
 
-            # Similar improvements for tail pages...
             table.tail_pages = [None] * table.num_tail_pages
-            
-            for index in range(0, table.num_tail_pages):
-                if index not in table_history["tail"]:
-                    continue
-                    
-                numrecords_list = table_history["tail"][index]
-                tail_path = os.path.join(tablepath, f"tail_{index}")
-                tail_page = LogicalPage(table)
-                
-                for col_index in range(min(len(numrecords_list), table.num_columns + 4)): 
-                    numrecords = numrecords_list[col_index]
-                    if os.path.exists(tail_path):
-                        page_filepath = os.path.join(tail_path, f"page_{col_index}.dat")
-                        if os.path.exists(page_filepath):
-                            # Actively load the page data
-                            page = self._load_page_if_needed(table_name, "tail", index, col_index)
-                            if page:
-                                tail_page.columns[col_index] = page
-                                # Add to buffer pool
-                                self.add_page_to_bufferpool(table_name, "tail", index, col_index, page)
-                
-                tail_page.num_records = max(numrecords_list) if numrecords_list else 0
+            free_tail_pages = set(table.free_tail_pages)
+            for index, num_records in enumerate(manifest["tail"][:table.num_tail_pages]):
+                if index in free_tail_pages:
+                    continue  # Reclaimed by a merge, new_tail_page hands it out again
+                tail_page = LogicalPage(table, loaded=False)
+                tail_page.num_records = num_records
                 table.tail_pages[index] = tail_page
-            
-            self.tables[table_name] = table
+
+            if table.zone_map is None:
+                table.rebuild_zone_map()
+
+            loaded_tables.append(table)
+
+        if not lazy:
+            self._load_all_pages(loaded_tables)
+
+    def _manifest_from_segments(self, table):
+        manifest = {"base": [0] * table.num_base_pages, "tail": [0] * table.num_tail_pages}
+        for page_type in ["base", "tail"]:
+            segment = self._segment(table.name, page_type, create=False)
+            if segment is None:
+                continue
+            for index in range(min(segment.num_pages(), len(manifest[page_type]))):
+                manifest[page_type][index] = max(segment.read_num_records(index, col_index)
+                                                 for col_index in range(table.num_columns + 4))
+        return manifest
+
+    def _load_all_pages(self, tables):
+        """Read every page of tables into the buffer pool, as far as its budget goes"""
+        # The placeholders stay empty, _pin_page finds the pages in the buffer pool
+        keys = []
+        for table in tables:
+            for page_type, logical_pages in [("base", table.base_pages), ("tail", table.tail_pages)]:
+                for index in range(len(logical_pages)):
+                    if logical_pages[index] is None:
+                        continue
+                    for col_index in range(table.num_columns + 4):
+                        keys.append((table.name, page_type, index, col_index))
+
+        def load_batch(batch):
+            for key in batch:
+                self._load_page_if_needed(*key)
+
+        self._run_io(load_batch, [keys[i:i + IO_BATCH_PAGES] for i in range(0, len(keys), IO_BATCH_PAGES)])
+
+    def _run_io(self, function, batches):
+        """Runs function on every batch on the I/O workers and returns the results in order"""
+        if self.io_pool is None or len(batches) <= 1:
+            return [function(batch) for batch in batches]
+        futures = [self.io_pool.submit(function, batch) for batch in batches]
+        # result() re-raises the first failure of a batch here
+        return [future.result() for future in futures]
 
     def _load_page_if_needed(self, table_name, page_type, page_index, col_index):
         """Load a page from disk if not in bufferpool"""
@@ -189,180 +331,126 @@ class Database():
             return page
         
         # Page not in buffer pool, load from disk
-        table_path = os.path.join(self.path, table_name)
-        folder_path = os.path.join(table_path, f"{page_type}_{page_index}")
-        page_filepath = os.path.join(folder_path, f"page_{col_index}.dat")
-        
-        if os.path.exists(page_filepath):
-            with open(page_filepath, "rb") as f:
-                page_data = f.read()
-            
-            pkl_filepath = os.path.join(folder_path, f"page_{col_index}.pkl")
-            if os.path.exists(pkl_filepath):
-                try:
-                    with open(pkl_filepath, "rb") as f:
-                        num_records = pickle.load(f)
-                except Exception as e:
-                    print(f"Error loading page metadata: {e}")
-                    num_records = 0
-            else:
-                # If metadata file is missing, try to determine records count from data size
-                num_records = len(page_data) // 8  # Assuming 8-byte records
-            
-            page = Page()
-            page.data = page_data
-            page.num_records = num_records
-            page.is_dirty = False  # Reset dirty flag for loaded pages
-            
-            # Add to buffer pool and return
-            return self.add_page_to_bufferpool(table_name, page_type, page_index, col_index, page)
-        
-        return None
+        segment = self._segment(table_name, page_type, create=False)
+        if segment is None:
+            return None
+
+        start = time.perf_counter()
+        if self.mmap_pages:
+            loaded = segment.view_page(page_index, col_index)
+        else:
+            loaded = segment.read_page(page_index, col_index)
+        if loaded is None:
+            return None
+        page_data, num_records, encoding = loaded
+
+        page = Page(0)  # Sized by load_bytes
+        page.load_bytes(page_data, encoding)
+        page.num_records = num_records
+        page.is_dirty = False  # Reset dirty flag for loaded pages
+        self.io_stats.table(table_name).record_read(len(page_data), time.perf_counter() - start)
+
+        # Add to buffer pool and return
+        return self.add_page_to_bufferpool(table_name, page_type, page_index, col_index, page)
 
     def close(self):
-        if not os.path.exists(self.path):
-            os.makedirs(self.path)
-    
-        # Flush all pages in the buffer pool, not just dirty ones
-        with self.bufferpool_lock:
-            for key, page in list(self.bufferpool.items()):
-                if page is None:
-                    print(f"Warning: Found None page in buffer pool for key {key}")
-                    continue
-                table_name, page_type, page_index, col_index = key
-                # Write all pages to ensure durability
-                self._write_page_to_disk(table_name, page_type, page_index, col_index, page)
-        
-        # Write all logical pages' data regardless of buffer pool status
-        for table_name, table in self.tables.items():
-            table_path = os.path.join(self.path, table_name)
-            if not os.path.exists(table_path):
-                os.makedirs(table_path)
-                
-            # Write base pages
-            for base_idx, base_page in enumerate(table.base_pages):
-                if base_page is not None:
-                    folder_path = os.path.join(table_path, f"base_{base_idx}")
-                    if not os.path.exists(folder_path):
-                        os.makedirs(folder_path)
-                        
-                    for col_idx, page in enumerate(base_page.columns):
-                        if page is not None:
-                            data_file = os.path.join(folder_path, f"page_{col_idx}.dat")
-                            pkl_file = os.path.join(folder_path, f"page_{col_idx}.pkl")
-                            
-                            with open(data_file, "wb") as f:
-                                f.write(page.data)
-                            with open(pkl_file, "wb") as f:
-                                pickle.dump(page.num_records, f)
-            
-            # Write tail pages
-            for tail_idx, tail_page in enumerate(table.tail_pages):
-                if tail_page is not None:
-                    folder_path = os.path.join(table_path, f"tail_{tail_idx}")
-                    if not os.path.exists(folder_path):
-                        os.makedirs(folder_path)
-                        
-                    for col_idx, page in enumerate(tail_page.columns):
-                        if page is not None:
-                            data_file = os.path.join(folder_path, f"page_{col_idx}.dat")
-                            pkl_file = os.path.join(folder_path, f"page_{col_idx}.pkl")
-                            
-                            with open(data_file, "wb") as f:
-                                f.write(page.data)
-                            with open(pkl_file, "wb") as f:
-                                pickle.dump(page.num_records, f)
-            
-            # Save table metadata
-            self.save_table(table_name)
+        if self.flusher is not None:
+            self.flusher.stop()
+            self.flusher = None
+        if self.read_ahead is not None:
+            self.read_ahead.stop()
+            self.read_ahead = None
+
+        self.checkpoint()
+        for segment in self.segments.values():
+            segment.close()
+        self.segments = {}
+        if self.io_pool is not None:
+            self.io_pool.shutdown()
+            self.io_pool = None
+        if self.merge_mode == "process":
+            shutdown_merge_process_pool()
 
         global db_instance
         if db_instance == self:
             db_instance = None
 
+    """
+    # Writes every dirty page exactly once and saves the table metadata, without closing
+    # the database. Clean pages are not written at all. Returns the number of pages written
+    """
+    def checkpoint(self):
+        os.makedirs(self.path, exist_ok=True)
+
+        dirty = {}  # table_name -> {key: page}
+        for key, page in self.bufferpool.dirty_pages():
+            dirty.setdefault(key[0], {})[key] = page
+
+        for table_name, table in list(self.tables.items()):
+            # Dirty pages the buffer pool no longer tracks can only sit in logical pages
+            # written since the last checkpoint, no need to walk the others
+            for page_type, dirty_pages in [("base", table.dirty_base_pages), ("tail", table.dirty_tail_pages)]:
+                logical_pages = table._logical_pages(page_type)
+                for page_index in list(dirty_pages):
+                    dirty_pages.discard(page_index)
+                    for col_index, page in enumerate(logical_pages[page_index].columns):
+                        if page is not None and page.is_dirty:
+                            dirty.setdefault(table_name, {}).setdefault((table_name, page_type, page_index, col_index), page)
+
+        # Batches never span tables and hold pages in file offset order, a table's
+        # segments are synced once all of its batches are written and only then is
+        # its metadata saved, so the saved metadata never points at unwritten pages
+        batches = []
+        for table_name, pages in dirty.items():
+            keys = sorted(pages)
+            batches += [[(key, pages[key]) for key in keys[i:i + IO_BATCH_PAGES]]
+                        for i in range(0, len(keys), IO_BATCH_PAGES)]
+        written = sum(self._run_io(self._write_batch, batches))
+
+        # Pages of dirty victims still being written by an evicting thread may land after this
+        self._run_io(lambda segment: segment.sync(), list(self.segments.values()))
+        for table_name in list(self.tables):
+            self.save_table(table_name)
+        return written
+
+    def _write_batch(self, batch):
+        written = 0
+        for key, page in batch:
+            written += self._write_resident_page(key, page)
+        return written
+
     def save_table(self, table_name):
-        try:
-            self.tables[table_name].lock_map = {}
-            table_save = self.tables[table_name].get_table_stats()
-            table_directory = os.path.join(self.path, table_name)
-            
-            # Create directory structure if it doesn't exist
-            if not os.path.exists(table_directory):
-                os.makedirs(table_directory)
-                
-            table_filename = os.path.join(table_directory, f"{table_name}.pkl")
-            with open(table_filename, "wb") as f:
-                pickle.dump(table_save, f)
-        except TypeError as e:
-            # Catch TypeError if there is a threading lock that cannot be pickled
-            print(f"Error caught while saving table {table_name}: {e}")
+        table_directory = os.path.join(self.path, table_name)
+        # Create directory structure if it doesn't exist
+        os.makedirs(table_directory, exist_ok=True)
+        save_catalog(os.path.join(table_directory, CATALOG_FILE), self.tables[table_name].get_table_stats())
+
     def load_table(self, table_name):
-        table_filename = os.path.join(self.path, table_name, f"{table_name}.pkl")
-        with open(table_filename, "rb") as f:
-            state = pickle.load(f)
-        
-        table = Table(state["name"], state["num_columns"], state["key"])
+        state = load_catalog(os.path.join(self.path, table_name, CATALOG_FILE))
+        geometry = PageGeometry(state["page_size"], state["base_pages_per_range"])
+        table = Table(state["name"], state["num_columns"], state["key"], geometry)
         table.restore_from_state(state)  # Restore excluding base_pages and tail_pages
+        table.merge_mode = self.merge_mode
         return table
     
-    def load_page_histories(self, table_name):
-        tablepath = os.path.join(self.path, table_name)
-        page_histories = {"base": {}, "tail": {}}
-
-        if not os.path.exists(tablepath):
-            return page_histories 
-
-        # Load base pages
-        for base_folder in os.listdir(tablepath):
-            if base_folder.startswith("base_"):
-                base_index = int(base_folder.split("_")[1])
-                colpath = os.path.join(tablepath, base_folder)
-                page_histories["base"][base_index] = []
-                
-                # Initialize with zeros for all potential columns
-                column_records = [0] * 100  # Large enough to handle any number of columns
-                
-                for file in os.listdir(colpath):
-                    if file.endswith(".pkl"):
-                        page_index = int(file.split("_")[1].split(".")[0])
-                        with open(os.path.join(colpath, file), "rb") as f:
-                            num_records = pickle.load(f)
-                        column_records[page_index] = num_records
-                
-                # Add only the needed columns based on the actual file data
-                page_histories["base"][base_index] = column_records
-
-            elif base_folder.startswith("tail_"):
-                tail_index = int(base_folder.split("_")[1])
-                colpath = os.path.join(tablepath, base_folder)
-                
-                # Initialize with zeros for all potential columns
-                column_records = [0] * 100  # Large enough to handle any number of columns
-                
-                for file in os.listdir(colpath):
-                    if file.endswith(".pkl"):  
-                        page_index = int(file.split("_")[1].split(".")[0])
-                        with open(os.path.join(colpath, file), "rb") as f:
-                            num_records = pickle.load(f)
-                        column_records[page_index] = num_records
-                        
-                page_histories["tail"][tail_index] = column_records
-
-        return page_histories
-
     """
     # Creates a new table
     :param name: string         #Table name
     :param num_columns: int     #Number of Columns: all columns are integer
     :param key: int             #Index of table key in columns
+    :param page_size: int       #Bytes per physical page, defaults to the database's page size
+    :param base_pages_per_range: int    #Base pages per page range, defaults to the database's
     """
-    def create_table(self, name, num_columns, key_index):
+    def create_table(self, name, num_columns, key_index, page_size=None, base_pages_per_range=None):
 
         if name in self.tables:
             print("Table already exists")
             return self.tables[name]
                 
-        table = Table(name, num_columns, key_index)
+        geometry = PageGeometry(page_size or self.geometry.page_size,
+                                base_pages_per_range or self.geometry.base_pages_per_range)
+        table = Table(name, num_columns, key_index, geometry)
+        table.merge_mode = self.merge_mode
         self.tables[name] = table
         return table
 
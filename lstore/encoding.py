@@ -0,0 +1,235 @@
+from array import array
+from bisect import bisect_right
+import struct
+import sys
+
+"""
+Lightweight columnar encodings for cold (merged) base pages. encode() tries every
+encoding on the values of one page and keeps the smallest, as long as it beats the raw
+8 bytes per value. The encoded page answers [i], [start:stop] and len() itself, so
+Page.read and Page.read_many work on it unchanged; the first write decodes it back
+into an array.
+
+    RLE     runs of equal values: run values, run end positions
+    DICT    few distinct values: sorted distinct values, one small code per value
+    FOR     frame of reference: minimum, one small offset from it per value
+    DELTA   arithmetic progressions such as RID columns: first value, step
+
+Payloads are little-endian and start with the number of values and, where there are
+packed integers, their width in bytes.
+"""
+
+RAW = 0
+RLE = 1
+DICT = 2
+FOR = 3
+DELTA = 4
+
+COUNT = struct.Struct("<IB")  # number of values, width of the packed integers
+INT64 = struct.Struct("<q")
+WIDTHS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+def _width(largest):
+    for width in [1, 2, 4]:
+        if largest < 1 << (8 * width):
+            return width
+    return 8
+
+def _pack(typecode, values):
+    values = array(typecode, values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+def _unpack(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class EncodedValues:
+    ENCODING = RAW
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return array('q', (self.get(i) for i in range(*index.indices(self.count))))
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("page index out of range")
+        return self.get(index)
+
+    def decode(self):
+        return self[0:self.count]
+
+
+class RunLengthValues(EncodedValues):
+    ENCODING = RLE
+
+    def __init__(self, count, values, ends):
+        self.count = count
+        self.values = values  # array('q') value of each run
+        self.ends = ends  # first position after each run
+        self.nbytes = COUNT.size + 8 * len(values) + 4 * len(ends)
+
+    def get(self, index):
+        return self.values[bisect_right(self.ends, index)]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return super().__getitem__(index)
+        start, stop, step = index.indices(self.count)
+        if step != 1:
+            return super().__getitem__(index)
+        result = array('q')
+        run = bisect_right(self.ends, start)
+        while start < stop:
+            end = min(self.ends[run], stop)
+            result.extend(array('q', [self.values[run]]) * (end - start))
+            start = end
+            run += 1
+        return result
+
+    def payload(self):
+        return COUNT.pack(self.count, 4) + _pack('q', self.values) + _pack('I', self.ends)
+
+    @classmethod
+    def from_payload(cls, data):
+        count, _ = COUNT.unpack_from(data)
+        runs = (len(data) - COUNT.size) // 12
+        values = _unpack('q', data[COUNT.size:COUNT.size + 8 * runs])
+        return cls(count, values, _unpack('I', data[COUNT.size + 8 * runs:]).tolist())
+
+    @classmethod
+    def encode(cls, values):
+        run_values, ends = array('q'), []
+        for position, value in enumerate(values):
+            if not run_values or value != run_values[-1]:
+                if run_values:
+                    ends.append(position)
+                run_values.append(value)
+        ends.append(len(values))
+        return cls(len(values), run_values, ends)
+
+
+class DictionaryValues(EncodedValues):
+    ENCODING = DICT
+
+    def __init__(self, count, dictionary, codes):
+        self.count = count
+        self.dictionary = dictionary  # array('q') of the distinct values
+        self.codes = codes  # array of indices into dictionary
+        self.nbytes = COUNT.size + INT64.size + 8 * len(dictionary) + codes.itemsize * len(codes)
+
+    def get(self, index):
+        return self.dictionary[self.codes[index]]
+
+    def payload(self):
+        return (COUNT.pack(self.count, self.codes.itemsize) + INT64.pack(len(self.dictionary)) +
+                _pack('q', self.dictionary) + _pack(self.codes.typecode, self.codes))
+
+    @classmethod
+    def from_payload(cls, data):
+        count, width = COUNT.unpack_from(data)
+        size = INT64.unpack_from(data, COUNT.size)[0]
+        start = COUNT.size + INT64.size
+        dictionary = _unpack('q', data[start:start + 8 * size])
+        return cls(count, dictionary, _unpack(WIDTHS[width], data[start + 8 * size:]))
+
+    @classmethod
+    def encode(cls, values, distinct):
+        dictionary = array('q', sorted(distinct))
+        code_of = {value: code for code, value in enumerate(dictionary)}
+        codes = array(WIDTHS[_width(len(dictionary) - 1)], [code_of[value] for value in values])
+        return cls(len(values), dictionary, codes)
+
+
+class FrameOfReferenceValues(EncodedValues):
+    ENCODING = FOR
+
+    def __init__(self, count, reference, offsets):
+        self.count = count
+        self.reference = reference  # Smallest value of the page
+        self.offsets = offsets  # array of value - reference
+        self.nbytes = COUNT.size + INT64.size + offsets.itemsize * len(offsets)
+
+    def get(self, index):
+        return self.reference + self.offsets[index]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return super().__getitem__(index)
+        reference = self.reference
+        return array('q', [reference + offset for offset in self.offsets[index]])
+
+    def payload(self):
+        return (COUNT.pack(self.count, self.offsets.itemsize) + INT64.pack(self.reference) +
+                _pack(self.offsets.typecode, self.offsets))
+
+    @classmethod
+    def from_payload(cls, data):
+        count, width = COUNT.unpack_from(data)
+        reference = INT64.unpack_from(data, COUNT.size)[0]
+        return cls(count, reference, _unpack(WIDTHS[width], data[COUNT.size + INT64.size:]))
+
+    @classmethod
+    def encode(cls, values, smallest, largest):
+        offsets = array(WIDTHS[_width(largest - smallest)], [value - smallest for value in values])
+        return cls(len(values), smallest, offsets)
+
+
+class DeltaValues(EncodedValues):
+    ENCODING = DELTA
+
+    def __init__(self, count, first, step):
+        self.count = count
+        self.first = first
+        self.step = step  # Difference between neighbouring values, the same for all of them
+        self.nbytes = COUNT.size + 2 * INT64.size
+
+    def get(self, index):
+        return self.first + index * self.step
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return super().__getitem__(index)
+        return array('q', [self.first + position * self.step for position in range(*index.indices(self.count))])
+
+    def payload(self):
+        return COUNT.pack(self.count, 8) + INT64.pack(self.first) + INT64.pack(self.step)
+
+    @classmethod
+    def from_payload(cls, data):
+        count, _ = COUNT.unpack_from(data)
+        return cls(count, INT64.unpack_from(data, COUNT.size)[0], INT64.unpack_from(data, COUNT.size + INT64.size)[0])
+
+
+DECODERS = {RLE: RunLengthValues, DICT: DictionaryValues, FOR: FrameOfReferenceValues, DELTA: DeltaValues}
+
+"""
+# Returns the smallest encoding of values (an array('q')) or None if none beats raw
+"""
+def encode(values):
+    count = len(values)
+    if count == 0:
+        return None
+    first = values[0]
+    step = values[1] - first if count > 1 else 0
+    if -(1 << 63) <= step < 1 << 63 and all(values[i] - values[i - 1] == step for i in range(2, count)):
+        return DeltaValues(count, first, step)
+
+    distinct = set(values)
+    candidates = [RunLengthValues.encode(values),
+                  FrameOfReferenceValues.encode(values, min(distinct), max(distinct))]
+    if len(distinct) <= 1 << 16:
+        candidates.append(DictionaryValues.encode(values, distinct))
+    best = min(candidates, key=lambda encoded: encoded.nbytes)
+    return best if best.nbytes < 8 * count else None
+
+def decode(encoding, data):
+    return DECODERS[encoding].from_payload(data)
@@ -0,0 +1,57 @@
+import threading
+
+"""
+Background write-behind for the buffer pool. While the database is open the flusher
+wakes up every interval seconds (or as soon as a foreground eviction had to write a
+dirty page itself) and, once dirty pages take up more than high_watermark of the pool
+budget, writes the oldest dirty pages until they are back under low_watermark.
+Evictions then mostly find clean victims, and close() only has a small remainder to write.
+"""
+class PageFlusher(threading.Thread):
+
+    def __init__(self, db, high_watermark=0.5, low_watermark=0.25, interval=0.05):
+        super().__init__(daemon=True)  # Never keeps the interpreter alive on its own
+        self.db = db
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.interval = interval
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.pages_flushed = 0
+
+    def run(self):
+        while not self.stopped:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            if not self.stopped:
+                self.flush_if_needed()
+
+    def stop(self):
+        self.stopped = True
+        self.wakeup.set()
+        self.join()
+
+    """
+    # Writes dirty pages until the dirty ratio drops under the low watermark, but only
+    # once it has gone over the high watermark. Returns the number of pages written
+    """
+    def flush_if_needed(self):
+        budget = self.db.bufferpool_bytes
+        dirty = self.db.bufferpool.dirty_pages()
+        dirty_bytes = sum(page.size_bytes() for _, page in dirty)
+        if dirty_bytes <= self.high_watermark * budget:
+            return 0
+
+        flushed = 0
+        for key, page in dirty:
+            if dirty_bytes <= self.low_watermark * budget:
+                break
+            # Pages in use right now will most likely be dirtied again, skip them
+            if page.pin_count > 0 or not page.is_dirty:
+                continue
+            dirty_bytes -= page.size_bytes()
+            if self.db._write_resident_page(key, page):
+                flushed += 1
+
+        self.pages_flushed += flushed
+        return flushed
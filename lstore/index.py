@@ -18,12 +18,16 @@ class Index:
 
     """
     # returns the location of all records with the given value on column "column"
+    # Columns without an index are scanned, skipping pages by their zone map
     """
     def locate(self, column, value):
         if not (0 <= column < self.table.num_columns):
             raise ValueError(f"Invalid column number: {column}")
-        
-        if self.indices[column] != None and self.indices[column].has_key(value):
+
+        if self.indices[column] is None:
+            return self.table.scan(column, value, value)
+
+        if self.indices[column].has_key(value):
             return self.indices[column][value]
 
         return []
@@ -36,7 +40,7 @@ class Index:
             raise ValueError(f"Invalid column number: {column}")
         
         if self.indices[column] == None:
-            return []
+            return [[rid] for rid in self.table.scan(column, begin, end)]
 
         return list(self.indices[column].values(begin, end))
     
@@ -44,31 +48,71 @@ class Index:
     # optional: Create index on specific column
     """
     def create_index(self, column_number):
-        self.indices[column_number] = OOBTree()
+        # Build the tree off to the side and publish it at the end, so lookups running
+        # while an index is rebuilt (e.g. after a merge) never see a half-built tree
+        index = OOBTree()
+
+        # This walks four columns of every base page in order
+        from .db import db_instance
+        if db_instance is not None:
+            for col_idx in [SCHEMA_ENCODING_COLUMN, INDIRECTION_COLUMN, RID_COLUMN, column_number]:
+                db_instance.hint_sequential(self.table.name, "base", self.table.column_slot(col_idx))
+
         for base_page_idx, base_page in enumerate(self.table.base_pages):
-            for i in range(base_page.num_records):
-                # Check if the record has been modified
-                schema_encoding = base_page.columns[SCHEMA_ENCODING_COLUMN].read(i)
-                modified = (schema_encoding >> column_number) & 1
-                
-                # Get the record ID
-                rid = base_page.columns[RID_COLUMN].read(i)
-                
-                # Get the value for this column
-                if modified:
-                    tid = base_page.columns[INDIRECTION_COLUMN].read(i)
+            # One bulk read per column and page, through the buffer pool since the
+            # pages may have been evicted
+            num_records = base_page.num_records
+            schema_encodings = self.table.read_base_column(SCHEMA_ENCODING_COLUMN, base_page_idx, 0, num_records)
+            indirections = self.table.read_base_column(INDIRECTION_COLUMN, base_page_idx, 0, num_records)
+            rids = self.table.read_base_column(RID_COLUMN, base_page_idx, 0, num_records)
+            values = self.table.read_base_column(column_number, base_page_idx, 0, num_records)
+            for i in range(num_records):
+                rid = rids[i]
+                # Check if the record has been modified since its base page was last merged,
+                # merges leave the schema encoding as it is
+                tid = indirections[i]
+                if (schema_encodings[i] >> column_number) & 1 and tid & 1:
                     tail_idx, tail_pos = self.table.page_directory[tid]
                     value = self.table.read_tail_page(column_number, tail_idx, tail_pos)
                 else:
-                    # Read directly from the base page if not modified
-                    value = base_page.columns[column_number].read(i)
+                    value = values[i]
                 
                 # Add to the index
-                if value in self.indices[column_number]:
-                    self.indices[column_number][value].append(rid)
+                if value in index:
+                    index[value].append(rid)
                 else:
-                    self.indices[column_number][value] = [rid]
+                    index[value] = [rid]
 
+        self.indices[column_number] = index
+
+
+    """
+    # Adds rid under value to the index of column, if it has one
+    """
+    def add(self, column, value, rid):
+        index = self.indices[column]
+        if index is None:
+            return
+        # Rid lists are never changed in place, locate hands them out and save_catalog
+        # writes them while updates go on, so a new list replaces the old one
+        rids = index.get(value)
+        index[value] = [rid] if rids is None else rids + [rid]
+
+    """
+    # Moves rid from old_value to new_value in the index of column, if it has one
+    """
+    def move(self, column, old_value, new_value, rid):
+        index = self.indices[column]
+        if index is None:
+            return
+        rids = index.get(old_value)
+        if rids is not None:
+            remaining = [other for other in rids if other != rid]
+            if not remaining:
+                del index[old_value]
+            elif len(remaining) < len(rids):
+                index[old_value] = remaining
+        self.add(column, new_value, rid)
 
     """
     # optional: Drop index of specific column
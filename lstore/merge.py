@@ -0,0 +1,61 @@
+from .page import Page
+
+"""
+Consolidation step of a merge. It works on page images (the bytes of a page as stored
+on disk) only, so it runs the same on the merge thread and in a worker process of a
+ProcessPoolExecutor, where it does not compete with queries for the GIL. The merge
+thread takes the snapshots and swaps the resulting pages in, see Table._merge_worker.
+"""
+
+"""
+# Builds merged base page images. Every record whose indirection points at a tail
+# record takes the columns of that record, the newest one, which holds every column
+:param records_per_page: int    #Records per physical page of the table
+:param pages: list              #[(base_idx, indirection image, rid image, {col_slot: image}), ...]
+                                  the base pages and the columns of them to rewrite
+:param tail_images: dict        #{(tail_idx, col_slot): image} of the tail pages to merge from
+:param tail_window: tuple       #PageDirectory.tail_window, packed locations of the tail rids
+# Returns [(base_idx, {col_slot: image}, [(base_pos, bid, merged tid), ...]), ...] of the
+# pages with records to merge. Records whose tail record is not among tail_images are
+# left out
+"""
+def consolidate(records_per_page, pages, tail_images, tail_window):
+    tail_start, tail_locations = tail_window
+    shipped = {tail_idx for tail_idx, _ in tail_images}
+    tail_columns = {}
+
+    def load(image):
+        page = Page(records_per_page)
+        page.load_bytes(image)
+        return page
+
+    merged_pages = []
+    for base_idx, indirection_image, rid_image, images in pages:
+        merged = []
+        locations = []
+        for base_pos, (indirection, bid) in enumerate(zip(load(indirection_image).data, load(rid_image).data)):
+            if not indirection & 1:  # Even RID = no tail record since the last merge
+                continue
+            i = (indirection >> 1) - tail_start
+            if not 0 <= i < len(tail_locations) or tail_locations[i] < 0:
+                continue
+            tail_idx, tail_pos = divmod(tail_locations[i], records_per_page)
+            if tail_idx not in shipped:
+                continue
+            merged.append((base_pos, bid, indirection))
+            locations.append((base_pos, tail_idx, tail_pos))
+        if not merged:
+            continue
+
+        new_images = {}
+        for col_slot, image in images.items():
+            page = load(image)
+            values = page.data
+            for base_pos, tail_idx, tail_pos in locations:
+                key = (tail_idx, col_slot)
+                if key not in tail_columns:
+                    tail_columns[key] = load(tail_images[key]).data
+                values[base_pos] = tail_columns[key][tail_pos]
+            new_images[col_slot] = page.to_bytes()
+        merged_pages.append((base_idx, new_images, merged))
+    return merged_pages
@@ -1,44 +1,151 @@
-import time
+from array import array
+import sys
+from .config import RECORDS_PER_PAGE
+from .encoding import RAW, EncodedValues, encode, decode
+
+try:
+    import numpy
+except ImportError:  # Optional, only needed for Page.as_numpy
+    numpy = None
+
+# Pages are stored on disk as little-endian int64 values
+NATIVE_IS_DISK_ORDER = sys.byteorder == "little"
 
 class Page:
-    def __init__(self):
+    def __init__(self, records_per_page=RECORDS_PER_PAGE):
         self.num_records = 0
-        self.data = bytearray(4096)
+        # One native-endian int64 per record: an array('q'), or read-only (a memoryview
+        # into a mapped segment file for pages loaded in mmap mode, or EncodedValues for
+        # compressed pages), turned into an array on the first write
+        self.data = array('q', bytes(8 * records_per_page))
         self.is_dirty = False
         self.dirty_map = set()
         self.pin_count = 0  # Track number of active operations using this page
-        self.last_accessed = 0  # Timestamp for LRU tracking
-    
+        # Cold pages (merged base pages) are written compressed, and always whole since
+        # the page on disk has a different layout than the one in memory
+        self.cold = False
+
     # Add pin/unpin methods
     def pin(self):
         self.pin_count += 1
-        self.last_accessed = time.time()
-    
+
     def unpin(self):
         if self.pin_count > 0:
             self.pin_count -= 1
-    
-    # Modify write method to update last_accessed
+
     def write(self, value, index = -1):
-        self.last_accessed = time.time()
         if index == -1 and not self.has_capacity():
             return False
         if index == -1:
             index = self.num_records
             self.num_records += 1
-        
-        byte_value = value.to_bytes(8, byteorder='big')
-        self.data[index * 8: (index + 1) * 8] = byte_value
-        
+        elif index >= self.num_records:
+            # Positional writes fill the page too, keep the count persisted with it right
+            self.num_records = index + 1
+
+        if not isinstance(self.data, array):
+            self._make_writable()
+        self.data[index] = value
+
         self.is_dirty = True
         self.dirty_map.add(index)
         return True
-    
-    # Modify read method to update last_accessed
+
+    def _make_writable(self):
+        if isinstance(self.data, EncodedValues):
+            self.data = self.data.decode()
+        else:
+            self.data = array('q', self.data)
+
+    """
+    # Copies data that is a view into a mapped segment file into an array the page owns,
+    # so it stays as it is once the slot of the page on disk is written over
+    """
+    def detach(self):
+        if isinstance(self.data, memoryview):
+            self.data = array('q', self.data)
+
     def read(self, index):
-        self.last_accessed = time.time()
-        return int.from_bytes(self.data[index*8 : (index+1)*8], byteorder='big')
-    
+        return self.data[index]
+
+    """
+    # Returns the values of records start to stop - 1 as a list
+    """
+    def read_many(self, start, stop):
+        return self.data[start:stop].tolist()
+
+    """
+    # Writes values to the records from start on, returns False if they do not fit
+    """
+    def write_many(self, start, values):
+        stop = start + len(values)
+        if stop > len(self.data):
+            return False
+        if not isinstance(self.data, array):
+            self._make_writable()
+        self.data[start:stop] = array('q', values)
+        self.num_records = max(self.num_records, stop)
+        self.is_dirty = True
+        self.dirty_map.update(range(start, stop))
+        return True
+
+    """
+    # The records as a NumPy int64 array sharing memory with the page, read-only for
+    # mapped pages and a decoded copy for compressed ones. Writes through the view
+    # bypass dirty tracking
+    """
+    def as_numpy(self):
+        if numpy is None:
+            raise ImportError("Page.as_numpy requires NumPy")
+        if isinstance(self.data, EncodedValues):
+            return numpy.frombuffer(self.data.decode(), dtype=numpy.int64)
+        return numpy.frombuffer(self.data, dtype=numpy.int64)
+
+    """
+    # Replaces the contents with page bytes as stored on disk. A memoryview is kept
+    # as a read-only view when its byte order allows it, anything else is copied
+    """
+    def load_bytes(self, data, encoding=RAW):
+        if encoding != RAW:
+            self.data = decode(encoding, data)
+            self.cold = True
+            return
+        if isinstance(data, memoryview) and NATIVE_IS_DISK_ORDER:
+            self.data = data.cast('q')
+            return
+        self.data = array('q')
+        self.data.frombytes(data)
+        if not NATIVE_IS_DISK_ORDER:
+            self.data.byteswap()
+
+    """
+    # Returns the bytes of records start to stop - 1 as stored on disk
+    """
+    def to_bytes(self, start=0, stop=None):
+        values = self.data[start:stop]
+        if NATIVE_IS_DISK_ORDER:
+            return values.tobytes()
+        values = array('q', values)
+        values.byteswap()
+        return values.tobytes()
+
+    """
+    # Returns (encoding, bytes) of the whole page as stored on disk, compressed when
+    # one of the encodings is smaller than the raw values
+    """
+    def encode(self):
+        if isinstance(self.data, EncodedValues):
+            return self.data.ENCODING, self.data.payload()
+        encoded = encode(self.data)
+        if encoded is None:
+            return RAW, self.to_bytes()
+        return encoded.ENCODING, encoded.payload()
+
+    # Bytes this page holds in memory, what the buffer pool budget is charged for
+    def size_bytes(self):
+        if isinstance(self.data, EncodedValues):
+            return self.data.nbytes
+        return len(self.data) * 8
+
     def has_capacity(self):
-        # Assuming a page can hold 512 records, like LogicalPage
-        return self.num_records < 512
\ No newline at end of file
+        return self.num_records < len(self.data)
@@ -0,0 +1,141 @@
+from array import array
+import threading
+
+"""
+Maps record ids to (page index, slot) without a Python object per record. Base rids
+are even and tail rids odd, and each kind is handed out two apart in allocation order,
+so rid >> 1 indexes one int64 array per kind. An entry packs the location as
+page_index * records_per_page + slot, or is -1 where no record was placed (an insert
+rejected for a duplicate key has used up its rid already) or where a merge reclaimed
+the tail record. The tail array starts at tail rid 2 * tail_start + 1, trim drops the
+reclaimed entries ahead of the oldest tail record still kept.
+
+Reads behave like the dict this replaces, except that locations come back as tuples.
+"""
+
+NO_RECORD = -1
+
+class PageDirectory:
+
+    def __init__(self, records_per_page, base=None, tail=None, count=None, tail_start=0):
+        self.records_per_page = records_per_page
+        self.base = base if base is not None else array('q')  # Packed location of base rid 2 * i
+        tail = tail if tail is not None else array('q')
+        # (tail_start, packed location of tail rid 2 * (tail_start + i) + 1), replaced as
+        # a whole when trimmed so lookups without the lock never see half of a trim
+        self.tail_window = (tail_start, tail)
+        if count is None:
+            count = len(self.base) - self.base.count(NO_RECORD) + len(tail) - tail.count(NO_RECORD)
+        self.count = count
+        self.lock = threading.Lock()  # Growing an array and filling the new entry go together
+
+    @property
+    def tail(self):
+        return self.tail_window[1]
+
+    @property
+    def tail_start(self):
+        return self.tail_window[0]
+
+    def _find(self, rid):
+        if rid & 1:
+            start, locations = self.tail_window
+            i = (rid >> 1) - start
+        else:
+            locations = self.base
+            i = rid >> 1
+        if 0 <= i < len(locations):
+            return locations[i]
+        return NO_RECORD
+
+    def __getitem__(self, rid):
+        location = self._find(rid)
+        if location < 0:
+            raise KeyError(rid)
+        return divmod(location, self.records_per_page)
+
+    def __setitem__(self, rid, location):
+        page_index, slot = location
+        with self.lock:
+            locations = self.base
+            i = rid >> 1
+            if rid & 1:
+                start, locations = self.tail_window
+                if i < start:
+                    # Older than every tail record kept, only after a trim
+                    locations = array('q', [NO_RECORD]) * (start - i) + locations
+                    start = i
+                    self.tail_window = (start, locations)
+                i -= start
+            if i >= len(locations):
+                locations.extend(array('q', [NO_RECORD]) * (i + 1 - len(locations)))
+            if locations[i] < 0:
+                self.count += 1
+            locations[i] = page_index * self.records_per_page + slot
+
+    """
+    # Forgets rid, if it is there
+    """
+    def discard(self, rid):
+        with self.lock:
+            locations = self.tail if rid & 1 else self.base
+            i = (rid >> 1) - self.tail_start if rid & 1 else rid >> 1
+            if 0 <= i < len(locations) and locations[i] >= 0:
+                locations[i] = NO_RECORD
+                self.count -= 1
+
+    """
+    # Releases the entries of the tail rids older than the oldest one still mapped
+    """
+    def trim(self):
+        with self.lock:
+            start, locations = self.tail_window
+            kept = next((i for i, location in enumerate(locations) if location >= 0), len(locations))
+            if kept:
+                self.tail_window = (start + kept, locations[kept:])
+
+    def get(self, rid, default=None):
+        location = self._find(rid)
+        if location < 0:
+            return default
+        return divmod(location, self.records_per_page)
+
+    def __contains__(self, rid):
+        return self._find(rid) >= 0
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        tail_start, tail = self.tail_window
+        for parity, start, locations in [(0, 0, self.base), (1, tail_start, tail)]:
+            for i, location in enumerate(locations, start):
+                if location >= 0:
+                    yield 2 * i + parity, divmod(location, self.records_per_page)
+
+    def keys(self):
+        return [rid for rid, _ in self.items()]
+
+    def values(self):
+        return [location for _, location in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, PageDirectory):
+            return ((self.records_per_page, self.base, self.tail_start, self.tail) ==
+                    (other.records_per_page, other.base, other.tail_start, other.tail))
+        return dict(self.items()) == {rid: tuple(location) for rid, location in dict(other).items()}
+
+    """
+    # Snapshot that writers adding records meanwhile do not change
+    """
+    def copy(self):
+        with self.lock:
+            return PageDirectory(self.records_per_page, array('q', self.base), array('q', self.tail), self.count,
+                                 self.tail_start)
+
+    # Bytes held for the whole directory
+    def nbytes(self):
+        return (len(self.base) + len(self.tail)) * self.base.itemsize
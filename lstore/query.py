@@ -34,6 +34,9 @@ class Query:
         #self.table.write_base_page(INDIRECTION_COLUMN, -1, base_idx, base_pos)
 
         del self.table.index.indices[self.table.key][primary_key]
+        # The record stays in its base page, which no longer counts as fully live
+        base_idx, _ = self.table.page_directory[bid[0]]
+        self.table.zone_map.remove(base_idx)
         return True
     
     
@@ -56,7 +59,10 @@ class Query:
         
         self.table.lock_map[columns[key_col]] = ReadWriteLockNoWait()
         
-        # Get current base page and record position
+        # Get current base page and record position, starting a new base page when
+        # the current one is full so no physical page grows past PAGE_SIZE
+        if not self.table.base_pages[self.table.num_base_pages - 1].has_capacity():
+            self.table.new_base_page()
         base_idx = self.table.num_base_pages - 1
         base_pos = self.table.base_pages[base_idx].num_records
         
@@ -71,12 +77,18 @@ class Query:
         self.table.write_base_page(INDIRECTION_COLUMN, bid, base_idx, base_pos)  # point to itself first
         self.table.write_base_page(TIMESTAMP_COLUMN, 0, base_idx, base_pos)
         
-        # Update index and page directory
-        self.table.index.indices[key_col][columns[key_col]] = [bid]
+        # Update page directory and index, in this order so a reader (or a catalog save)
+        # that finds the rid in the index can always locate it
         self.table.page_directory[bid] = [base_idx, base_pos]  # Position in Base Page
+        self.table.index.indices[key_col][columns[key_col]] = [bid]
+        indices = self.table.index.indices
+        for col_idx, value in enumerate(columns):
+            if col_idx != key_col and indices[col_idx] is not None:
+                self.table.index.add(col_idx, value, bid)
         
         # Only increment record count once, after all columns are written
         self.table.base_pages[base_idx].num_records += 1
+        self.table.zone_map.add(base_idx, columns)
 
         return True
 
@@ -123,26 +135,18 @@ class Query:
                 
             if not self.table.lock_map[key].try_acquire_read():
                 return False
-            col = []
             rid = self.table.read_base_page(INDIRECTION_COLUMN, base_idx, base_pos)
             
             # backtrack until the rid = bid or reached wanted version
-            while rid & 1 and relative_version < 0:
-                relative_version += 1
-                tail_idx, tail_pos = self.table.page_directory[rid]
-                rid = self.table.read_tail_page(INDIRECTION_COLUMN, tail_idx, tail_pos)
+            rid = self.table.version_rid(rid, relative_version)
                 
-            if rid & 1:
+            projected = [i for i in range(self.table.num_columns) if projected_columns_index[i] == 1]
+            if rid is not None:
                 tail_idx, tail_pos = self.table.page_directory[rid]
-                for i in range(self.table.num_columns):
-                    if projected_columns_index[i] != 1:
-                        continue
-                    col.append(self.table.read_tail_page(i, tail_idx, tail_pos))
+                col = self.table.read_record("tail", tail_idx, tail_pos, projected)
             else:
-                for i in range(self.table.num_columns):
-                    if projected_columns_index[i] != 1:
-                        continue
-                    col.append(self.table.read_base_page(i, base_idx, base_pos))
+                rid = bid
+                col = self.table.read_record("base", base_idx, base_pos, projected)
             records.append(Record(rid, key, col))
             self.table.lock_map[key].release_read() 
         return records
@@ -191,8 +195,8 @@ class Query:
         
         try:
             # Batch read metadata
-            schema_encoding = self.table.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx, base_pos)
-            indirection = self.table.read_base_page(INDIRECTION_COLUMN, base_idx, base_pos)
+            schema_encoding, indirection = self.table.read_record(
+                "base", base_idx, base_pos, [SCHEMA_ENCODING_COLUMN, INDIRECTION_COLUMN])
             
             # Optimize column updates tracking
             columns_to_update = []
@@ -208,19 +212,16 @@ class Query:
             if not columns_to_update:
                 return True
             
-            # Batch read current values
-            current_values = {}
+            # Batch read current values, of every column since the new tail record holds
+            # a full copy of the record
             if indirection & 1:  # Record has updates
                 # Get the most recent tail record
                 tail_idx, tail_pos = self.table.page_directory[indirection]
-                
-                # Read all needed columns in one batch
-                for i in columns_to_update:
-                    current_values[i] = self.table.read_tail_page(i, tail_idx, tail_pos)
+                values = self.table.read_record("tail", tail_idx, tail_pos, range(self.table.num_columns))
             else:
                 # Read from base page
-                for i in columns_to_update:
-                    current_values[i] = self.table.read_base_page(i, base_idx, base_pos)
+                values = self.table.read_record("base", base_idx, base_pos, range(self.table.num_columns))
+            current_values = dict(enumerate(values))
             
             # Check if any values actually changed
             actual_updates_needed = False
@@ -238,19 +239,11 @@ class Query:
             for i in columns_to_update:
                 new_schema |= (1 << i)
             
-            # Pre-allocate tail page if needed
-            tail_idx = self.table.num_tail_pages - 1
-            need_new_tail_page = (self.table.num_tail_pages == 0 or 
-                                not self.table.tail_pages[tail_idx].has_capacity())
-            
-            if need_new_tail_page:
-                self.table.new_tail_page()
-                tail_idx = self.table.num_tail_pages - 1
-            
-            tail_pos = self.table.tail_pages[tail_idx].num_records
+            # Tail record goes to a tail page of the record's own page range
+            tail_idx, tail_pos = self.table.reserve_tail_slot(base_idx)
             
             # Prepare all values to be written at once
-            tid = self.table.tid_counter
+            tid = self.table.new_tid()
             current_time = int(time())
             
             # Use a single batch write for all tail page updates
@@ -268,18 +261,17 @@ class Query:
                 base_pos
             )
             
+            # Update page directory, before the base record points readers at the tid
+            self.table.page_directory[tid] = [tail_idx, tail_pos]
+
             # Update base record - only the necessary fields
             self.table.write_base_page(INDIRECTION_COLUMN, tid, base_idx, base_pos)
             
             # Only update schema if it changed
             if new_schema != schema_encoding:
                 self.table.write_base_page(SCHEMA_ENCODING_COLUMN, new_schema, base_idx, base_pos)
-            
-            # Update page directory
-            self.table.page_directory[tid] = [tail_idx, tail_pos]
-            self.table.tid_counter += 2
-            self.table.tail_pages[tail_idx].num_records += 1
             self.table.updates += 1
+            self.table.zone_map.update(base_idx, columns_to_update, updated_values)
             
             # Update index if primary key changed
             if primary_key_changed:
@@ -289,6 +281,11 @@ class Query:
                 # Update lock map
                 if new_primary_key not in self.table.lock_map:
                     self.table.lock_map[new_primary_key] = ReadWriteLockNoWait()
+
+            # Move the record in the secondary indices of the changed columns
+            for i, value in zip(columns_to_update, updated_values):
+                if i != self.table.key and value != current_values[i]:
+                    self.table.index.move(i, current_values[i], value, bid)
             
             return True
         finally:
@@ -355,22 +352,35 @@ class Query:
         
         if self.table.should_merge():
             self.table.merge()
-            
+
+        # Base pages whose zone map puts every key in range and that lost no record to a
+        # delete are summed a whole page at a time, the others record by record
+        whole_pages = set()
+        zone_map = self.table.zone_map
+        for base_idx, inside in zone_map.candidates(self.table.key, start_range, end_range, len(self.table.base_pages)):
+            num_records = self.table.base_pages[base_idx].num_records
+            if not inside or zone_map.counts[base_idx] != num_records:
+                continue
+            page_total = self._sum_page(base_idx, num_records, aggregate_column_index, relative_version)
+            if page_total is False:
+                return False
+            total += page_total
+            whole_pages.add(base_idx)
+
         for bid in bids:
           bid = bid[0]
           ver = relative_version
           base_idx, base_pos = self.table.page_directory[bid]
+          if base_idx in whole_pages:
+              continue
           pkey = self.table.read_base_page(self.table.key, base_idx, base_pos)
           if not self.table.lock_map[pkey].try_acquire_read():
               return False
           rid = self.table.read_base_page(INDIRECTION_COLUMN, base_idx, base_pos)
           # backtrack until the rid = bid or reached wanted version
-          while rid & 1 and ver < 0:
-              ver += 1
-              tail_idx, tail_pos = self.table.page_directory[rid]
-              rid = self.table.read_tail_page(INDIRECTION_COLUMN, tail_idx, tail_pos)
+          rid = self.table.version_rid(rid, ver)
 
-          if rid & 1:
+          if rid is not None:
               tail_idx, tail_pos = self.table.page_directory[rid]
               total += self.table.read_tail_page(aggregate_column_index, tail_idx, tail_pos)
           else:
@@ -378,6 +388,37 @@ class Query:
           self.table.lock_map[pkey].release_read()
         return total
 
+    """
+    # Sum of one column over the records 0 to num_records - 1 of a base page, with one bulk
+    # read per column. Returns False if one of the records is locked
+    """
+    def _sum_page(self, base_idx, num_records, aggregate_column_index, relative_version):
+        keys = self.table.read_base_column(self.table.key, base_idx, 0, num_records)
+        indirections = self.table.read_base_column(INDIRECTION_COLUMN, base_idx, 0, num_records)
+        values = self.table.read_base_column(aggregate_column_index, base_idx, 0, num_records)
+        locks = []
+        try:
+            for key in keys:
+                if key not in self.table.lock_map:
+                    self.table.lock_map[key] = ReadWriteLockNoWait()
+                if not self.table.lock_map[key].try_acquire_read():
+                    return False
+                locks.append(self.table.lock_map[key])
+
+            total = 0
+            for rid, value in zip(indirections, values):
+                # backtrack until the rid = bid or reached wanted version
+                rid = self.table.version_rid(rid, relative_version)
+                if rid is not None:
+                    tail_idx, tail_pos = self.table.page_directory[rid]
+                    total += self.table.read_tail_page(aggregate_column_index, tail_idx, tail_pos)
+                else:
+                    total += value
+            return total
+        finally:
+            for lock in locks:
+                lock.release_read()
+
     
     """
     incremenets one column of the record
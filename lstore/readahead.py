@@ -0,0 +1,81 @@
+from .page import Page
+import threading
+import queue
+
+"""
+Sequential read-ahead for the buffer pool. Every page access is reported through
+on_access; once a reader of one (table, page_type, column) stream moves on to the page
+right after the previous one, the next window pages of that stream are queued and
+loaded from disk by a background I/O thread, so a cold scan finds them already cached.
+Callers that know they are about to walk a column in order (index builds, merges) can
+start the window up front with hint.
+"""
+class ReadAhead(threading.Thread):
+
+    def __init__(self, db, window=8):
+        super().__init__(daemon=True)  # Never keeps the interpreter alive on its own
+        self.db = db
+        self.window = window  # Pages kept queued ahead of a sequential reader
+        self.requests = queue.Queue()
+        self.last_page = {}  # stream -> last page index read
+        self.queued_up_to = {}  # stream -> first page index not queued yet
+        self.pages_loaded = 0
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            self._load(*request)
+
+    def stop(self):
+        self.requests.put(None)
+        self.join()
+
+    def on_access(self, table_name, page_type, page_index, col_index):
+        stream = (table_name, page_type, col_index)
+        last = self.last_page.get(stream)
+        if last == page_index:
+            return
+        self.last_page[stream] = page_index
+        if last is None or page_index != last + 1:
+            # Random access, forget the window of the previous run
+            self.queued_up_to[stream] = page_index + 1
+            return
+        self._schedule(stream, page_index + 1)
+
+    """
+    # Starts reading ahead from start_page before the first access of a sequential walk
+    """
+    def hint(self, table_name, page_type, col_index, start_page=0):
+        stream = (table_name, page_type, col_index)
+        self.last_page[stream] = start_page
+        self.queued_up_to[stream] = start_page
+        self._schedule(stream, start_page)
+
+    def _schedule(self, stream, start):
+        # Top the window up in half-window steps instead of one page per access
+        queued = self.queued_up_to.get(stream, start)
+        if queued >= start + self.window // 2:
+            return
+        end = start + self.window
+        table_name, page_type, col_index = stream
+        for page_index in range(max(queued, start), end):
+            self.requests.put((table_name, page_type, page_index, col_index))
+        self.queued_up_to[stream] = end
+
+    def _load(self, table_name, page_type, page_index, col_index):
+        table = self.db.tables.get(table_name)
+        if table is None:
+            return
+        logical_pages = table.base_pages if page_type == "base" else table.tail_pages
+        if page_index >= len(logical_pages) or logical_pages[page_index] is None:
+            return
+        # Only pages that live on disk alone: a page the table still holds may be
+        # newer than its file
+        if isinstance(logical_pages[page_index].columns[col_index], Page):
+            return
+        if (table_name, page_type, page_index, col_index) in self.db.bufferpool:
+            return
+        if self.db._load_page_if_needed(table_name, page_type, page_index, col_index) is not None:
+            self.pages_loaded += 1
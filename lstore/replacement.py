@@ -0,0 +1,221 @@
+from collections import OrderedDict
+
+"""
+Page replacement policies for the BufferPool. A policy only tracks keys; the pool
+owns the pages and tells the policy about every hit, insert and removal.
+
+evict(count, is_pinned) picks up to count unpinned victims, forgets them (or moves
+them to its ghost lists) and returns their keys. Policies never return a key for which
+is_pinned(key) is True, and keys the pool has not stored yet are reported as pinned.
+"""
+
+class LRUPolicy:
+    name = "lru"
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.order = OrderedDict()  # Least recently used key first
+
+    def hit(self, key):
+        self.order.move_to_end(key)
+
+    def insert(self, key):
+        self.order[key] = None
+
+    def remove(self, key):
+        self.order.pop(key, None)
+
+    def evict(self, count, is_pinned):
+        victims = []
+        for key in self.order:
+            if is_pinned(key):
+                continue
+            victims.append(key)
+            if len(victims) >= count:
+                break
+        for key in victims:
+            del self.order[key]
+        return victims
+
+
+class ClockPolicy:
+    """
+    # Second-chance CLOCK: a hit only sets a reference bit, so hits never reorder anything.
+    # The hand sweeps from the front, clearing set bits and sending those keys to the back.
+    """
+    name = "clock"
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.ring = OrderedDict()  # key -> reference bit, the hand is at the front
+
+    def hit(self, key):
+        self.ring[key] = True
+
+    def insert(self, key):
+        self.ring[key] = False
+
+    def remove(self, key):
+        self.ring.pop(key, None)
+
+    def evict(self, count, is_pinned):
+        victims = []
+        # Two sweeps are enough to clear every reference bit once
+        for _ in range(2 * len(self.ring)):
+            if len(victims) >= count or not self.ring:
+                break
+            key, referenced = next(iter(self.ring.items()))
+            if referenced or is_pinned(key):
+                self.ring[key] = False
+                self.ring.move_to_end(key)
+                continue
+            del self.ring[key]
+            victims.append(key)
+        return victims
+
+
+class TwoQueuePolicy:
+    """
+    # Simplified 2Q: new pages enter the FIFO a1in and only reach the LRU am if they are
+    # requested again after leaving it (while their key is remembered in the ghost a1out).
+    # A single scan therefore cycles through a1in without flushing the hot pages in am.
+    """
+    name = "2q"
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.kin = max(capacity // 4, 1)  # Target size of a1in
+        self.kout = max(capacity // 2, 1)  # Number of ghost keys remembered
+        self.a1in = OrderedDict()
+        self.a1out = OrderedDict()
+        self.am = OrderedDict()
+
+    def hit(self, key):
+        # Hits in a1in do not promote, that is what makes the policy scan resistant
+        if key in self.am:
+            self.am.move_to_end(key)
+
+    def insert(self, key):
+        if key in self.a1out:
+            del self.a1out[key]
+            self.am[key] = None
+        else:
+            self.a1in[key] = None
+
+    def remove(self, key):
+        self.a1in.pop(key, None)
+        self.am.pop(key, None)
+
+    def _pick(self, queue, is_pinned):
+        for key in queue:
+            if not is_pinned(key):
+                return key
+        return None
+
+    def evict(self, count, is_pinned):
+        victims = []
+        while len(victims) < count:
+            key = None
+            if len(self.a1in) > self.kin or not self.am:
+                key = self._pick(self.a1in, is_pinned)
+                if key is not None:
+                    del self.a1in[key]
+                    self.a1out[key] = None
+                    if len(self.a1out) > self.kout:
+                        self.a1out.popitem(last=False)
+            if key is None:
+                key = self._pick(self.am, is_pinned)
+                if key is not None:
+                    del self.am[key]
+            if key is None:
+                key = self._pick(self.a1in, is_pinned)
+                if key is not None:
+                    del self.a1in[key]
+            if key is None:
+                break
+            victims.append(key)
+        return victims
+
+
+class ARCPolicy:
+    """
+    # Adaptive Replacement Cache (Megiddo & Modha). t1 holds pages seen once, t2 pages seen
+    # at least twice, b1/b2 remember keys recently evicted from each. A ghost hit in b1
+    # grows the target size p of t1, a ghost hit in b2 shrinks it.
+    """
+    name = "arc"
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.p = 0  # Target size of t1
+        self.t1 = OrderedDict()
+        self.t2 = OrderedDict()
+        self.b1 = OrderedDict()
+        self.b2 = OrderedDict()
+
+    def hit(self, key):
+        if key in self.t1:
+            del self.t1[key]
+            self.t2[key] = None
+        else:
+            self.t2.move_to_end(key)
+
+    def insert(self, key):
+        if key in self.b1:
+            self.p = min(self.capacity, self.p + max(len(self.b2) // max(len(self.b1), 1), 1))
+            del self.b1[key]
+            self.t2[key] = None
+        elif key in self.b2:
+            self.p = max(0, self.p - max(len(self.b1) // max(len(self.b2), 1), 1))
+            del self.b2[key]
+            self.t2[key] = None
+        else:
+            self.t1[key] = None
+            # Keep each ghost list no longer than the cache itself
+            if len(self.b1) > self.capacity:
+                self.b1.popitem(last=False)
+            if len(self.b2) > self.capacity:
+                self.b2.popitem(last=False)
+
+    def remove(self, key):
+        self.t1.pop(key, None)
+        self.t2.pop(key, None)
+
+    def _pick(self, queue, is_pinned):
+        for key in queue:
+            if not is_pinned(key):
+                return key
+        return None
+
+    def evict(self, count, is_pinned):
+        victims = []
+        while len(victims) < count:
+            if self.t1 and len(self.t1) > self.p:
+                order = [(self.t1, self.b1), (self.t2, self.b2)]
+            else:
+                order = [(self.t2, self.b2), (self.t1, self.b1)]
+
+            key = None
+            for resident, ghost in order:
+                key = self._pick(resident, is_pinned)
+                if key is not None:
+                    del resident[key]
+                    ghost[key] = None
+                    break
+            if key is None:
+                break
+            victims.append(key)
+        return victims
+
+
+POLICIES = {
+    LRUPolicy.name: LRUPolicy,
+    ClockPolicy.name: ClockPolicy,
+    TwoQueuePolicy.name: TwoQueuePolicy,
+    ARCPolicy.name: ARCPolicy,
+}
+
+def make_policy(name, capacity):
+    if name not in POLICIES:
+        raise ValueError(f"Unknown replacement policy: {name}")
+    return POLICIES[name](capacity)
@@ -0,0 +1,123 @@
+from .config import PAGE_SIZE
+from .encoding import RAW
+import mmap
+import os
+import struct
+import threading
+
+"""
+Segment files hold every physical page of one table and page type ("base" or "tail")
+in a single file instead of one .dat/.pkl pair per page per column. The file is an
+array of fixed-size slots, one per (page index, column), each a small header followed
+by the page bytes:
+
+    slot offset = (page_index * num_slots_per_page + col_index) * slot_size
+    header      = num_records, length of the page data in bytes, encoding of the data
+                  (0 for raw int64 values, see encoding.py for the others)
+
+Slots never move, so a page is written in place with one pwrite and read with one
+pread. A slot that was never written reads back as zeros, i.e. as an empty page.
+"""
+
+HEADER = struct.Struct("<qiI")
+
+class SegmentFile:
+
+    def __init__(self, path, num_slots_per_page, page_size=PAGE_SIZE):
+        self.path = path
+        self.num_slots_per_page = num_slots_per_page  # Physical pages per logical page
+        self.page_size = page_size
+        self.slot_size = HEADER.size + page_size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.lock = threading.Lock()  # Guards mapping and closing, pread/pwrite need no lock
+        self.mapping = None  # Read-only map of the file for view_page, grown as the file grows
+
+    def offset(self, page_index, col_index):
+        return (page_index * self.num_slots_per_page + col_index) * self.slot_size
+
+    """
+    # Returns (data, num_records, encoding) of a page, or None if the slot lies past the end of the file
+    """
+    def read_page(self, page_index, col_index):
+        slot = os.pread(self.fd, self.slot_size, self.offset(page_index, col_index))
+        if len(slot) < HEADER.size:
+            return None
+        num_records, length, encoding = HEADER.unpack_from(slot)
+        if length == 0:
+            # Hole left by a later page, never written
+            return bytes(self.page_size), num_records, RAW
+        data = slot[HEADER.size:HEADER.size + length]
+        if len(data) < length:
+            # Last slot of the file, written up to its last record only
+            data += bytes(length - len(data))
+        return data, num_records, encoding
+
+    """
+    # Like read_page, but the data is a read-only memoryview into a shared mapping of the
+    # file instead of a copy. Pages written later through write_page show up in the view
+    """
+    def view_page(self, page_index, col_index):
+        offset = self.offset(page_index, col_index)
+        mapping = self._mapping(offset + HEADER.size)
+        if mapping is None:
+            return None
+        num_records, length, encoding = HEADER.unpack_from(mapping, offset)
+        start = offset + HEADER.size
+        if length == 0:
+            length = self.page_size
+        mapping = self._mapping(start + length)
+        if mapping is None:
+            # The file ends inside this slot, pad a copy instead
+            return self.read_page(page_index, col_index)
+        return memoryview(mapping)[start:start + length], num_records, encoding
+
+    def _mapping(self, end):
+        """Mapping covering the first end bytes of the file, None if the file is shorter"""
+        mapping = self.mapping
+        if mapping is not None and len(mapping) >= end:
+            return mapping
+        with self.lock:
+            if self.mapping is None or len(self.mapping) < end:
+                size = os.fstat(self.fd).st_size
+                if size < end:
+                    return None
+                # Views handed out earlier keep the old mapping alive until they are dropped
+                self.mapping = mmap.mmap(self.fd, size, access=mmap.ACCESS_READ)
+            return self.mapping
+
+    def read_num_records(self, page_index, col_index):
+        header = os.pread(self.fd, HEADER.size, self.offset(page_index, col_index))
+        if len(header) < HEADER.size:
+            return 0
+        return HEADER.unpack(header)[0]
+
+    """
+    # Writes a page of length bytes whose bytes start:start + len(data) are data. The rest
+    # of the page must already be on disk, by default data is the whole page
+    """
+    def write_page(self, page_index, col_index, data, num_records, start=0, length=None, encoding=RAW):
+        if length is None:
+            length = len(data)
+        if length > self.page_size or start + len(data) > length:
+            raise ValueError(f"Page of {length} bytes does not fit a {self.page_size} byte slot")
+        offset = self.offset(page_index, col_index)
+        header = HEADER.pack(num_records, length, encoding)
+        if start == 0:
+            os.pwrite(self.fd, header + data, offset)
+        else:
+            os.pwrite(self.fd, header, offset)
+            os.pwrite(self.fd, data, offset + HEADER.size + start)
+
+    def num_pages(self):
+        return -(-os.fstat(self.fd).st_size // (self.num_slots_per_page * self.slot_size))
+
+    def sync(self):
+        os.fsync(self.fd)
+
+    def close(self):
+        with self.lock:
+            # Views into the mapping stay valid after the descriptor is closed
+            self.mapping = None
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
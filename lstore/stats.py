@@ -0,0 +1,92 @@
+import threading
+
+"""
+Buffer pool and I/O counters, kept per table. Updating a counter is a plain integer
+add on an object the caller already has, so they are cheap enough to stay on all the
+time. Database.stats() sums them up and adds the current buffer pool residency;
+Database.reset_stats() zeroes them between benchmark phases.
+
+Page-fault latencies go into a histogram with power-of-two microsecond buckets:
+bucket i counts loads that took less than 2**i microseconds (and at least 2**(i-1)).
+"""
+
+LATENCY_BUCKETS = 32
+
+class IOCounters:
+    __slots__ = ('hits', 'misses', 'evictions', 'writebacks', 'pages_read', 'bytes_read',
+                 'pages_written', 'bytes_written', 'fault_latency')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.hits = 0  # Page accesses served from memory
+        self.misses = 0  # Page accesses that had to load the page from disk
+        self.evictions = 0  # Pages dropped by the buffer pool
+        self.writebacks = 0  # Dirty pages written because they were evicted
+        self.pages_read = 0
+        self.bytes_read = 0
+        self.pages_written = 0
+        self.bytes_written = 0
+        self.fault_latency = [0] * LATENCY_BUCKETS
+
+    def record_read(self, nbytes, seconds):
+        self.pages_read += 1
+        self.bytes_read += nbytes
+        bucket = min(int(seconds * 1e6).bit_length(), LATENCY_BUCKETS - 1)
+        self.fault_latency[bucket] += 1
+
+    def record_write(self, nbytes):
+        self.pages_written += 1
+        self.bytes_written += nbytes
+
+    def add_to(self, totals):
+        for field in self.__slots__:
+            if field == 'fault_latency':
+                for bucket, count in enumerate(self.fault_latency):
+                    totals['fault_latency'][bucket] += count
+            else:
+                totals[field] += getattr(self, field)
+
+
+class IOStats:
+
+    def __init__(self):
+        self.tables = {}  # table name -> IOCounters
+        self.lock = threading.Lock()
+
+    def table(self, table_name):
+        counters = self.tables.get(table_name)
+        if counters is None:
+            with self.lock:
+                counters = self.tables.setdefault(table_name, IOCounters())
+        return counters
+
+    def reset(self):
+        for counters in list(self.tables.values()):
+            counters.reset()
+
+    """
+    # Returns ({counter: value} over all tables, {table name: {counter: value}})
+    # fault_latency becomes {bucket upper bound in microseconds: count}, empty buckets left out
+    """
+    def snapshot(self):
+        totals = self._empty()
+        per_table = {}
+        for table_name, counters in list(self.tables.items()):
+            table_totals = self._empty()
+            counters.add_to(table_totals)
+            counters.add_to(totals)
+            per_table[table_name] = self._finish(table_totals)
+        return self._finish(totals), per_table
+
+    def _empty(self):
+        totals = {field: 0 for field in IOCounters.__slots__}
+        totals['fault_latency'] = [0] * LATENCY_BUCKETS
+        return totals
+
+    def _finish(self, totals):
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_ratio'] = totals['hits'] / lookups if lookups else 0.0
+        totals['fault_latency'] = {2 ** bucket: count for bucket, count in enumerate(totals['fault_latency']) if count}
+        return totals
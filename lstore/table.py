@@ -8,9 +8,21 @@ from .config import (
     RID_COLUMN,
     TIMESTAMP_COLUMN,
     SCHEMA_ENCODING_COLUMN,
+    BASE_PAGES_PER_RANGE,
+    MERGE_CHAIN_LENGTH,
+    MERGE_PROCESSES,
+    PageGeometry,
 )
+from .merge import consolidate
+from .zonemap import ZoneMap, EMPTY_MIN, EMPTY_MAX
+from .page_directory import PageDirectory
 import concurrent.futures
+import multiprocessing
 thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=10)#max 10 threads
+process_pool = None  # Workers of merge_mode "process", started by the first such merge
+process_pool_lock = threading.Lock()
+
+FREE_TAIL_PAGE = -2  # Owning page range saved for a reclaimed tail page
 
 from timeit import default_timer as timer
 from decimal import Decimal
@@ -53,52 +65,73 @@ class Record:
         self.key = key
         self.columns = columns
         
-class PageRange:
-    #Organizes multiple LogicalPages into a range
+def merge_process_pool():
+    global process_pool
+    with process_pool_lock:
+        if process_pool is None:
+            # Forking copies the locks of the flusher, read-ahead and query threads in
+            # whatever state they are in, so workers come from a fork server, or are spawned
+            # where there is none. Both import the script that started them again, under
+            # the name __mp_main__
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+            else:
+                context = multiprocessing.get_context("spawn")
+            process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=MERGE_PROCESSES, mp_context=context)
+        return process_pool
+
+def shutdown_merge_process_pool():
+    """Stops the merge worker processes, the next merge in "process" mode starts new ones"""
+    global process_pool
+    with process_pool_lock:
+        if process_pool is not None:
+            process_pool.shutdown()
+            process_pool = None
 
-    def __init__(self, range_id):
-        self.range_id = range_id
-        self.base_pages = [None] * 16  # Fixed-size array for base pages (16)
-        self.tail_pages = []  # Dynamic list for tail pages
-        self.num_base_pages = 0  # Tracks how many base pages are assigned
-
-    def add_base_page(self, logical_page):
-        #Adds LP to the fixed-size base pages array if  space
-        if self.num_base_pages < 16:
-            self.base_pages[self.num_base_pages] = logical_page
-            self.num_base_pages += 1
-            return True
-        return False  # Return False if base pages are full
 
-    def add_tail_page(self, logical_page):
-        #Adds a LogicalPage to the dynamic tail pages list
-        self.tail_pages.append(logical_page)
+class PageRange:
+    """
+    # A run of base_pages_per_range consecutive base pages and the tail pages holding the
+    # updates of their records, so updates to different ranges never share a tail page.
+    # Page indices stay table-wide: range r owns base pages r * base_pages_per_range on,
+    # and tail_pages lists the indices of its tail pages in Table.tail_pages
+    """
 
-    def get_base_pages(self):
-        #Returns all base pages
-        return [page for page in self.base_pages if page is not None]
+    def __init__(self, range_id, base_pages_per_range=BASE_PAGES_PER_RANGE):
+        self.range_id = range_id
+        self.base_pages_per_range = base_pages_per_range
+        self.first_base_page = range_id * base_pages_per_range
+        self.tail_pages = []  # Indices of this range's tail pages, oldest first
+        self.updates = 0  # Tail records written since this range was last merged
+        self.lock = threading.Lock()  # Hands out the tail record slots of this range
 
-    def get_tail_pages(self):
-        #Returns all tail pages
-        return self.tail_pages
+    def base_page_indices(self, num_base_pages):
+        return range(self.first_base_page, min(self.first_base_page + self.base_pages_per_range, num_base_pages))
 
 
 class LogicalPage:
 
-    def __init__(self, table):
+    def __init__(self, table, loaded=True):
         self.key = table.key
         self.num_columns = table.num_columns
         self.num_records = 0
+        self.records_per_page = table.geometry.records_per_page
         # + 4 for (as declared by global variables)
           # indirection column
           # rid column
           # timestamp column
           # schema encoding column
         self.PinLock = threading.Lock()
-        self.columns = [Page() for _ in range(self.num_columns + 4)]
+        self.cold = False  # Set once a merge has marked the pages of this full base page cold
+        # A page opened lazily starts with None placeholders, _pin_page faults each
+        # column in from disk on first access
+        if loaded:
+            self.columns = [Page(self.records_per_page) for _ in range(self.num_columns + 4)]
+        else:
+            self.columns = [None] * (self.num_columns + 4)
 
     def has_capacity(self):
-        return self.num_records < 512
+        return self.num_records < self.records_per_page
 
     def __getstate__(self):
         """ Exclude PinLock from being pickled """
@@ -112,13 +145,15 @@ class Table:
     :param name: string         #Table name
     :param num_columns: int     #Number of Columns: all columns are integer
     :param key: int             #Index of table key in columns
+    :param geometry: PageGeometry   #Page size and page range layout, the defaults in config if None
     """
 
-    def __init__(self, name, num_columns, key):
+    def __init__(self, name, num_columns, key, geometry=None):
         self.name = name
         self.key = key
         self.num_columns = num_columns
-        self.page_directory = {}
+        self.geometry = geometry if geometry is not None else PageGeometry()
+        self.page_directory = PageDirectory(self.geometry.records_per_page)  # rid -> (page index, slot)
         self.index = Index(self)
         self.lock_map = {}
         self.num_base_pages = 1
@@ -130,138 +165,356 @@ class Table:
         self.tid_counter = 1
         self.dirty_base_pages = set()
         self.dirty_tail_pages = set()
+        # Per base page and page range min/max/count of every column, prunes scans and sums
+        self.zone_map = ZoneMap(num_columns, self.geometry.base_pages_per_range)
 
         self.updates = 0
         self.merge_in_progress = False
-        
-    def new_base_page(self):
-        self.num_base_pages += 1
-        self.base_pages.append(LogicalPage(self))
+        # Page ranges in base page order, each with its own tail pages
+        self.page_ranges = [PageRange(0, self.geometry.base_pages_per_range)]
+        self.ranges_to_merge = set()  # Ids of the page ranges whose tail chains grew past MERGE_CHAIN_LENGTH
+        self.page_lock = threading.Lock()  # Appending logical pages hands out their table-wide index
+        self.tid_lock = threading.Lock()
+        # Tail pages the last merge found nothing needs anymore, freed by the next merge
+        # so readers that were walking a chain into them when they were retired are done
+        self.retired_tail_pages = []
+        self.free_tail_pages = []  # Indices of reclaimed tail pages, handed out again first
+        self.merge_mode = "thread"  # Where merges consolidate, "thread" or "process", see Database
 
-    def new_tail_page(self):
-        self.num_tail_pages += 1
-        self.tail_pages.append(LogicalPage(self))
+    def new_base_page(self):
+        with self.page_lock:
+            self.num_base_pages += 1
+            self.base_pages.append(LogicalPage(self))
+            if self.num_base_pages > len(self.page_ranges) * self.geometry.base_pages_per_range:
+                self.create_page_range()
 
-        # initialize page_ranges
-        # store page range objects / page range creation
-        self.page_ranges = []
-        self.create_page_range()
+    """
+    # Appends a tail page, owned by page_range if given, and returns its index
+    """
+    def new_tail_page(self, page_range=None):
+        with self.page_lock:
+            if self.free_tail_pages:
+                tail_idx = self.free_tail_pages.pop()
+                # Read-ahead may have brought the old contents back in meanwhile
+                self._drop_tail_page(tail_idx)
+                self.tail_pages[tail_idx] = LogicalPage(self)
+            else:
+                self.num_tail_pages += 1
+                self.tail_pages.append(LogicalPage(self))
+                tail_idx = self.num_tail_pages - 1
+        if page_range is not None:
+            page_range.tail_pages.append(tail_idx)
+        return tail_idx
 
     def create_page_range(self):
-        # Create pr add to the table
-        new_range = PageRange(len(self.page_ranges))
+        new_range = PageRange(len(self.page_ranges), self.geometry.base_pages_per_range)
         self.page_ranges.append(new_range)
+        return new_range
 
-    def assign_page_to_range(self, page):
-        # Assigns a page to the most recent pr
-        if not self.page_ranges:
-            self.create_page_range()
-        self.page_ranges[-1].add_page(page)  # Add page to latest range
+    def page_range_of(self, base_idx):
+        return self.page_ranges[base_idx // self.geometry.base_pages_per_range]
 
-    def read_base_page(self, col_idx, base_idx, base_pos):
-        # Get the Database instance
+    """
+    # Reserves the slot for a new tail record of a base record in base page base_idx, in
+    # the newest tail page of its page range, and returns (tail_idx, tail_pos)
+    """
+    def reserve_tail_slot(self, base_idx):
+        page_range = self.page_range_of(base_idx)
+        with page_range.lock:
+            if not page_range.tail_pages or not self.tail_pages[page_range.tail_pages[-1]].has_capacity():
+                self.new_tail_page(page_range)
+            tail_idx = page_range.tail_pages[-1]
+            tail_page = self.tail_pages[tail_idx]
+            tail_pos = tail_page.num_records
+            tail_page.num_records += 1
+            page_range.updates += 1
+            updates = page_range.updates
+        if updates > MERGE_CHAIN_LENGTH * self.page_range_records(page_range):
+            self.ranges_to_merge.add(page_range.range_id)
+        return tail_idx, tail_pos
+
+    def new_tid(self):
+        with self.tid_lock:
+            tid = self.tid_counter
+            self.tid_counter += 2
+        return tid
+
+    def page_range_records(self, page_range):
+        base_pages = self.base_pages
+        return sum(base_pages[base_idx].num_records for base_idx in page_range.base_page_indices(len(base_pages)))
+
+    def column_slot(self, col_idx):
+        return col_idx if col_idx >= 0 else self.num_columns + 4 + col_idx
+
+    def _logical_pages(self, page_type):
+        return self.base_pages if page_type == "base" else self.tail_pages
+
+    def _pin_page(self, page_type, page_idx, col_idx):
+        """Fetch a physical page through the buffer pool and pin it so it cannot be evicted"""
         from .db import db_instance
-        
+
+        logical_page = self._logical_pages(page_type)[page_idx]
+        # Metadata columns are addressed with negative indices, but the buffer pool and
+        # the page files use the physical slot in LogicalPage.columns
+        col_idx = self.column_slot(col_idx)
+
         # Try to get the page from buffer pool
-        page = db_instance.get_page_from_bufferpool(self.name, "base", base_idx, col_idx)
-        db_instance.add_page_to_bufferpool(self.name, "base", base_idx, col_idx, page)
-        
+        db_instance.on_page_access(self.name, page_type, page_idx, col_idx)
+        page = db_instance.get_page_from_bufferpool(self.name, page_type, page_idx, col_idx)
+
+        counters = db_instance.io_stats.table(self.name)
         if page is None:
-            # Page not in buffer pool, load it
-            with self.base_pages[base_idx].PinLock:
-                # Double-check if page is loaded
-                if isinstance(self.base_pages[base_idx].columns[col_idx], Page):
-                    page = self.base_pages[base_idx].columns[col_idx]
-                else:
-                    # Load page from disk
-                    page = db_instance._load_page_if_needed(self.name, "base", base_idx, col_idx)
-                    self.base_pages[base_idx].columns[col_idx] = page
-        
-        # Read the value
-        with self.base_pages[base_idx].PinLock:
+            # Page not in buffer pool, double-check if the logical page still holds it
+            with logical_page.PinLock:
+                if isinstance(logical_page.columns[col_idx], Page):
+                    page = logical_page.columns[col_idx]
+            if page is None:
+                # Load page from disk, a page that was never written starts out empty
+                # Done without PinLock, loading may evict pages of this logical page
+                counters.misses += 1
+                page = db_instance._load_page_if_needed(self.name, page_type, page_idx, col_idx)
+                if page is None:
+                    page = Page(self.geometry.records_per_page)
+            else:
+                counters.hits += 1
+        else:
+            counters.hits += 1
+
+        with logical_page.PinLock:
+            logical_page.columns[col_idx] = page
+            page.pin()
+
+        # Add or update in buffer pool, the pin keeps this page out of the eviction batch
+        resident = db_instance.add_page_to_bufferpool(self.name, page_type, page_idx, col_idx, page)
+        if resident is not page:
+            # Another thread cached its own copy first, use that one
+            with logical_page.PinLock:
+                page.unpin()
+                resident.pin()
+                logical_page.columns[col_idx] = resident
+            page = resident
+        return page
+
+    def _unpin_page(self, page_type, page_idx, page):
+        with self._logical_pages(page_type)[page_idx].PinLock:
+            page.unpin()
+
+    def release_page(self, page_type, page_idx, col_idx, page):
+        """Called when the buffer pool evicts page, forget it unless someone pinned it meanwhile"""
+        logical_pages = self._logical_pages(page_type)
+        if page_idx >= len(logical_pages) or logical_pages[page_idx] is None:
+            return
+        logical_page = logical_pages[page_idx]
+        with logical_page.PinLock:
+            if logical_page.columns[col_idx] is page and page.pin_count == 0:
+                logical_page.columns[col_idx] = None
+
+    """
+    # Values of columns (data columns or negative metadata columns) of the record in slot
+    # of a logical page, with one buffer pool lookup per column and one PinLock for all of
+    # them. Pages the lookup finds and that are still cached once pinned are not put back
+    # into the pool, only the missing ones take the full _pin_page path
+    """
+    def read_record(self, page_type, page_idx, slot, columns):
+        from .db import db_instance
+
+        logical_page = self._logical_pages(page_type)[page_idx]
+        slots = [self.column_slot(col_idx) for col_idx in columns]
+        pages = []
+        for col_slot in slots:
+            db_instance.on_page_access(self.name, page_type, page_idx, col_slot)
+            pages.append(db_instance.get_page_from_bufferpool(self.name, page_type, page_idx, col_slot))
+        with logical_page.PinLock:
+            for page in pages:
+                if page is not None:
+                    page.pin()
+        # A page evicted between the lookup and the pin is not cached anymore, writes to it
+        # would be lost, so it is fetched again like a miss
+        for i, (col_slot, page) in enumerate(zip(slots, pages)):
+            if page is not None and not db_instance.bufferpool.holds((self.name, page_type, page_idx, col_slot), page):
+                self._unpin_page(page_type, page_idx, page)
+                pages[i] = None
+        hits = 0
+        with logical_page.PinLock:
+            for col_slot, page in zip(slots, pages):
+                if page is not None:
+                    logical_page.columns[col_slot] = page
+                    hits += 1
+        db_instance.io_stats.table(self.name).hits += hits
+
+        try:
+            for i, page in enumerate(pages):
+                if page is None:
+                    pages[i] = self._pin_page(page_type, page_idx, columns[i])
+            return [page.read(slot) for page in pages]
+        finally:
+            with logical_page.PinLock:
+                for page in pages:
+                    if page is not None:
+                        page.unpin()
+
+    def read_base_page(self, col_idx, base_idx, base_pos):
+        page = self._pin_page("base", base_idx, col_idx)
+        try:
             return page.read(base_pos)
+        finally:
+            self._unpin_page("base", base_idx, page)
 
     def read_tail_page(self, col_idx, tail_idx, tail_pos):
-        # Get the Database instance
-        from .db import db_instance
-        
-        # Try to get the page from buffer pool
-        page = db_instance.get_page_from_bufferpool(self.name, "tail", tail_idx, col_idx)
-        db_instance.add_page_to_bufferpool(self.name, "tail", tail_idx, col_idx, page)
-        
-        if page is None:
-            # Page not in buffer pool, load it
-            with self.tail_pages[tail_idx].PinLock:
-                # Double-check if page is loaded
-                if isinstance(self.tail_pages[tail_idx].columns[col_idx], Page):
-                    page = self.tail_pages[tail_idx].columns[col_idx]
-                else:
-                    # Load page from disk
-                    page = db_instance._load_page_if_needed(self.name, "tail", tail_idx, col_idx)
-                    self.tail_pages[tail_idx].columns[col_idx] = page
-    
-        # Read the value
-        with self.tail_pages[tail_idx].PinLock:
+        page = self._pin_page("tail", tail_idx, col_idx)
+        try:
             return page.read(tail_pos)
+        finally:
+            self._unpin_page("tail", tail_idx, page)
+
+    """
+    # Values of column col_idx for the records start to stop - 1 of one base page, with
+    # a single pin instead of one per record
+    """
+    def read_base_column(self, col_idx, base_idx, start, stop):
+        if stop <= start:
+            return []
+        page = self._pin_page("base", base_idx, col_idx)
+        try:
+            return page.read_many(start, stop)
+        finally:
+            self._unpin_page("base", base_idx, page)
+
+    def read_tail_column(self, col_idx, tail_idx, start, stop):
+        if stop <= start:
+            return []
+        page = self._pin_page("tail", tail_idx, col_idx)
+        try:
+            return page.read_many(start, stop)
+        finally:
+            self._unpin_page("tail", tail_idx, page)
+
+    """
+    # Rid of the tail record holding the version relative_version steps back from the
+    # record version rid, or None if the base record holds it. Tail records reclaimed
+    # after a merge hold versions the merged base record holds already
+    """
+    def version_rid(self, rid, relative_version):
+        while rid & 1 and relative_version < 0:
+            location = self.page_directory.get(rid)
+            if location is None:
+                return None
+            relative_version += 1
+            rid = self.read_tail_page(INDIRECTION_COLUMN, location[0], location[1])
+        if rid & 1 and rid in self.page_directory:
+            return rid
+        return None
+
+    """
+    # The bytes of one physical page as stored on disk, a snapshot a merge works from
+    """
+    def read_page_image(self, page_type, page_idx, col_idx):
+        page = self._pin_page(page_type, page_idx, col_idx)
+        try:
+            return page.to_bytes()
+        finally:
+            self._unpin_page(page_type, page_idx, page)
+
+    """
+    # Latest values of column col_idx for the records start to stop - 1 of one base page.
+    # Records with tail versions take the value from the newest one, which holds every
+    # column. indirections may pass the indirection column of the same records
+    """
+    def read_current_column(self, col_idx, base_idx, start, stop, indirections=None):
+        if indirections is None:
+            indirections = self.read_base_column(INDIRECTION_COLUMN, base_idx, start, stop)
+        values = self.read_base_column(col_idx, base_idx, start, stop)
+        for i, rid in enumerate(indirections):
+            if rid & 1:
+                tail_idx, tail_pos = self.page_directory[rid]
+                values[i] = self.read_tail_page(col_idx, tail_idx, tail_pos)
+        return values
+
+    """
+    # Base rids of the live records whose latest value of column lies in [low, high]. Only
+    # the base pages whose zone map may hold such a value are read
+    """
+    def scan(self, column, low, high):
+        key_index = self.index.indices[self.key]
+        matches = []
+        for base_idx, _ in self.zone_map.candidates(column, low, high, len(self.base_pages)):
+            num_records = self.base_pages[base_idx].num_records
+            indirections = self.read_base_column(INDIRECTION_COLUMN, base_idx, 0, num_records)
+            values = self.read_current_column(column, base_idx, 0, num_records, indirections)
+            hits = [i for i, value in enumerate(values) if low <= value <= high]
+            if not hits:
+                continue
+            rids = self.read_base_column(RID_COLUMN, base_idx, 0, num_records)
+            keys = self.read_current_column(self.key, base_idx, 0, num_records, indirections)
+            for i in hits:
+                # Deleted records stay in their base page but are gone from the key index
+                if rids[i] in key_index.get(keys[i], ()):
+                    matches.append(rids[i])
+        return matches
+
+    """
+    # Recomputes the zone of one base page from the latest values of its records. With
+    # live_rids the number of live records is recounted too
+    """
+    def rebuild_zone(self, base_idx, live_rids=None):
+        self.zone_map.begin_rebuild(base_idx)
+        num_records = self.base_pages[base_idx].num_records
+        indirections = self.read_base_column(INDIRECTION_COLUMN, base_idx, 0, num_records)
+        mins, maxs = [], []
+        for col_idx in range(self.num_columns):
+            values = self.read_current_column(col_idx, base_idx, 0, num_records, indirections)
+            mins.append(min(values, default=EMPTY_MIN))
+            maxs.append(max(values, default=EMPTY_MAX))
+        count = None
+        if live_rids is not None:
+            rids = self.read_base_column(RID_COLUMN, base_idx, 0, num_records)
+            count = sum(1 for rid in rids if rid in live_rids)
+        self.zone_map.set_page(base_idx, mins, maxs, count)
+
+    """
+    # Builds the zone map from scratch, for tables saved before it existed
+    """
+    def rebuild_zone_map(self):
+        self.zone_map = ZoneMap(self.num_columns, self.geometry.base_pages_per_range)
+        live_rids = set()
+        for rids in self.index.indices[self.key].values():
+            live_rids.update(rids)
+        for base_idx in range(len(self.base_pages)):
+            self.rebuild_zone(base_idx, live_rids)
 
     def write_base_page(self, col_idx, value, base_idx=-1, base_pos=-1):
-        from .db import db_instance
-        
         if base_idx == -1:
             base_idx = self.num_base_pages - 1
         
         if base_pos == -1 and not self.base_pages[base_idx].has_capacity():
-            self.num_base_pages += 1
-            self.base_pages.append(LogicalPage(self))
+            self.new_base_page()
             base_idx = self.num_base_pages - 1
         
         # Get or create the page
-        page = db_instance.get_page_from_bufferpool(self.name, "base", base_idx, col_idx)
-        if page is None:
+        page = self._pin_page("base", base_idx, col_idx)
+        try:
+            # Write to the page
             with self.base_pages[base_idx].PinLock:
-                if isinstance(self.base_pages[base_idx].columns[col_idx], Page):
-                    page = self.base_pages[base_idx].columns[col_idx]
-                else:
-                    page = db_instance._load_page_if_needed(self.name, "base", base_idx, col_idx)
-                    if page is None:
-                        page = Page()
-                    self.base_pages[base_idx].columns[col_idx] = page
-        
-        # Write to the page
-        with self.base_pages[base_idx].PinLock:
-            page.write(value, base_pos)
-            page.is_dirty = True  # Mark the page as dirty
-            # Add or update in buffer pool
-            db_instance.add_page_to_bufferpool(self.name, "base", base_idx, col_idx, page)
-
-    def write_tail_page(self, col_idx, value, tail_idx=-1, tail_pos=-1):
-        from .db import db_instance
-        
-        if tail_idx == -1:
-            tail_idx = self.num_tail_pages - 1
-        
-        if self.num_tail_pages == 0 or (tail_pos == -1 and not self.tail_pages[tail_idx].has_capacity()):
-            self.num_tail_pages += 1
-            self.tail_pages.append(LogicalPage(self))
-            tail_idx = self.num_tail_pages - 1
-        
+                page.write(value, base_pos)
+                page.is_dirty = True  # Mark the page as dirty
+            self.dirty_base_pages.add(base_idx)
+        finally:
+            self._unpin_page("base", base_idx, page)
+
+    """
+    # Writes value to column col_idx of the tail record slot reserve_tail_slot handed out.
+    # Tail pages belong to page ranges and are only added by new_tail_page
+    """
+    def write_tail_page(self, col_idx, value, tail_idx, tail_pos):
         # Get or create the page
-        page = db_instance.get_page_from_bufferpool(self.name, "tail", tail_idx, col_idx)
-        if page is None:
+        page = self._pin_page("tail", tail_idx, col_idx)
+        try:
+            # Write to the page
             with self.tail_pages[tail_idx].PinLock:
-                if isinstance(self.tail_pages[tail_idx].columns[col_idx], Page):
-                    page = self.tail_pages[tail_idx].columns[col_idx]
-                else:
-                    page = db_instance._load_page_if_needed(self.name, "tail", tail_idx, col_idx)
-                    if page is None:
-                        page = Page()
-                    self.tail_pages[tail_idx].columns[col_idx] = page
-        
-        # Write to the page
-        with self.tail_pages[tail_idx].PinLock:
-            page.write(value, tail_pos)
-            # Add or update in buffer pool
-            db_instance.add_page_to_bufferpool(self.name, "tail", tail_idx, col_idx, page)
+                page.write(value, tail_pos)
+            self.dirty_tail_pages.add(tail_idx)
+        finally:
+            self._unpin_page("tail", tail_idx, page)
 
     def get_table_stats(self):#for getting table metadata to save
         state = {
@@ -270,188 +523,244 @@ class Table:
             'num_columns': self.num_columns,
             'tid_counter': self.tid_counter,
             'bid_counter': self.bid_counter,
-            'page_directory': self.page_directory,  # You might want to exclude or serialize this based on its contents
-            'index': self.index,  # This might need to be serialized separately, depending on its structure
+            'page_directory': self.page_directory.copy(),  # Copied, writers may be adding to it
+            'indices': list(self.index.indices),  # OOBTree per indexed column, None elsewhere
             'num_base_pages': self.num_base_pages,
             'num_tail_pages': self.num_tail_pages,
-            'updates': self.updates
+            'updates': self.updates,
+            # Owning page range of every tail page, -1 for tail pages shared by all ranges
+            'tail_page_ranges': self._tail_page_ranges(),
+            'range_updates': [page_range.updates for page_range in self.page_ranges],
+            'zone_map': self.zone_map,
+            'page_size': self.geometry.page_size,
+            'base_pages_per_range': self.geometry.base_pages_per_range,
+            # num_records of every logical page, lets open() skip reading the page files
+            'page_manifest': {
+                'base': [page.num_records if page is not None else 0 for page in self.base_pages],
+                'tail': [page.num_records if page is not None else 0 for page in self.tail_pages],
+            }
         }
         return state
       
     def restore_from_state(self, state):
         """ Restores a table from the saved state and reinitializes pages """
+        state = dict(state)
+        # The geometry is fixed when the table is created, see Database.load_table
+        state.pop('page_size', None)
+        state.pop('base_pages_per_range', None)
+        self.page_manifest = state.pop('page_manifest', None)
+        self.index.indices = state.pop('indices')
+        tail_page_ranges = state.pop('tail_page_ranges', None)
+        range_updates = state.pop('range_updates', None)
         self.__dict__.update(state)
         self.base_pages = []
         self.tail_pages = []
+
+        num_ranges = max(-(-self.num_base_pages // self.geometry.base_pages_per_range), 1)
+        self.page_ranges = [PageRange(range_id, self.geometry.base_pages_per_range) for range_id in range(num_ranges)]
+        # Tables saved before page ranges existed keep their tail pages shared, updates
+        # from now on go to tail pages of their own range
+        self.retired_tail_pages = []
+        self.free_tail_pages = []
+        for tail_idx, range_id in enumerate(tail_page_ranges or []):
+            if range_id >= 0:
+                self.page_ranges[range_id].tail_pages.append(tail_idx)
+            elif range_id == FREE_TAIL_PAGE:
+                self.free_tail_pages.append(tail_idx)
+        for page_range, updates in zip(self.page_ranges, range_updates or []):
+            page_range.updates = updates
+        self.ranges_to_merge = set()
         
         # Initialize lock_map if it doesn't exist
         if not hasattr(self, 'lock_map') or self.lock_map is None:
             self.lock_map = {}
         
         # Recreate locks for all keys in the index
-        if hasattr(self, 'index') and hasattr(self.index, 'indices') and self.key in self.index.indices:
-            for key in self.index.indices[self.key]:
+        if self.index.indices[self.key] is not None:
+            for key in self.index.indices[self.key].keys():
                 if key not in self.lock_map:
                     self.lock_map[key] = ReadWriteLockNoWait()
 
+    def _tail_page_ranges(self):
+        tail_page_ranges = [-1] * len(self.tail_pages)
+        for tail_idx in list(self.free_tail_pages):
+            tail_page_ranges[tail_idx] = FREE_TAIL_PAGE
+        for page_range in self.page_ranges:
+            for tail_idx in list(page_range.tail_pages):
+                if tail_idx < len(tail_page_ranges):
+                    tail_page_ranges[tail_idx] = page_range.range_id
+        return tail_page_ranges
+
+    """
+    # Merges the tail records of the page ranges that are due into their base pages in
+    # the background, or of every page range with updates if none is due yet
+    """
     def merge(self):
         if hasattr(self, 'merge_in_progress') and self.merge_in_progress:
             return False
         
         self.merge_in_progress = True
         start = timer()
+
+        range_ids = set(self.ranges_to_merge)
+        self.ranges_to_merge -= range_ids
+        if not range_ids:
+            range_ids = {page_range.range_id for page_range in self.page_ranges if page_range.updates > 0}
+        page_ranges = [self.page_ranges[range_id] for range_id in sorted(range_ids)]
+        # Updates arriving while the merge runs are left for the next one
+        merged_updates = [(page_range, page_range.updates) for page_range in page_ranges]
         
         def wrapped_merge():
-            return self._merge_worker()  # Make sure to return the result
+            return self._merge_worker(page_ranges)  # Make sure to return the result
         
         def timing_callback(future):
             end = timer()
             print("Merge time: ", Decimal(end - start).quantize(Decimal('0.01')), "seconds")
-            self._merge_completed(future)  # Pass the original future through
+            self._merge_completed(future, merged_updates)  # Pass the original future through
         
         merge_future = thread_pool.submit(wrapped_merge)
         merge_future.add_done_callback(timing_callback)
         return True
     
-    def _merge_worker(self):
+    """
+    # Builds merged copies of the full base pages of page_ranges off to the side, the live
+    # pages are only read. Every record with tail versions takes the data columns and
+    # timestamp of its newest tail record, which holds the whole record. The pages are
+    # snapshotted as page images and consolidated by lstore.merge.consolidate, on this
+    # thread or, with merge_mode "process", in a worker process. Returns
+    # ([(base_idx, {col_slot: new page}, [(base_pos, bid, merged tid), ...]), ...], merge_count)
+    """
+    def _merge_worker(self, page_ranges):
         print("Merge started")
-        processed_bids = set()
-        merge_count = 0
 
-        # Prefetch all needed pages to buffer pool
-        self._prefetch_pages_for_merge()
-        
         # Use local variables to avoid attribute lookups
         base_pages = self.base_pages
-        page_directory = self.page_directory
-        
-        base_updates = []  # [(base_idx, base_pos, col_idx, value), ...]
-        
-        # Process base pages in batches
-        batch_size = 100
-        for base_idx in range(len(base_pages)):
-            base_page = base_pages[base_idx]
-            if base_page is None:
-                continue
-                
-            # Process records in batches
-            for batch_start in range(0, base_page.num_records, batch_size):
-                batch_end = min(batch_start + batch_size, base_page.num_records)
-                update_batch = []
-                
-                # First pass: collect all indirection pointers
-                tail_pointers = []
-                for base_pos in range(batch_start, batch_end):
-                    bid = self.read_base_page(RID_COLUMN, base_idx, base_pos)
-                    if bid in processed_bids:
-                        continue
-                        
-                    indirection = self.read_base_page(INDIRECTION_COLUMN, base_idx, base_pos)
-                    if indirection & 1 and indirection != bid:  # Odd RID = tail record
-                        tail_pointers.append((base_pos, bid, indirection))
-                
-                # Second pass: process tail records in batches
-                for base_pos, bid, indirection in tail_pointers:
-                    schema_encoding = self.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx, base_pos)
-                    
-                    tail_values = [None] * self.num_columns
-                    latest_timestamp = None
-                    current_rid = indirection
-                    update_count = 0
-                    
-                    # Fast path for single update (common case)
-                    if current_rid & 1:
-                        try:
-                            tail_idx, tail_pos = page_directory[current_rid]
-                            
-                            # Faster bulk read of tail page
-                            tail_timestamp = self.read_tail_page(TIMESTAMP_COLUMN, tail_idx, tail_pos)
-                            latest_timestamp = tail_timestamp
-                            
-                            # Only read columns that have been updated
-                            for col_idx in range(self.num_columns):
-                                if (schema_encoding >> col_idx) & 1:
-                                    tail_values[col_idx] = self.read_tail_page(col_idx, tail_idx, tail_pos)
-                            
-                            next_rid = self.read_tail_page(INDIRECTION_COLUMN, tail_idx, tail_pos)
-                            
-                            # Check if we need to follow the chain
-                            if next_rid & 1 and next_rid != current_rid:
-                                # Fall back to full chain traversal
-                                while current_rid & 1:
-                                    tail_idx, tail_pos = page_directory.get(current_rid, (None, None))
-                                    if tail_idx is None:
-                                        break
-                                        
-                                    tail_timestamp = self.read_tail_page(TIMESTAMP_COLUMN, tail_idx, tail_pos)
-                                    if latest_timestamp is None or tail_timestamp > latest_timestamp:
-                                        latest_timestamp = tail_timestamp
-                                        
-                                    for col_idx in range(self.num_columns):
-                                        if tail_values[col_idx] is None and (schema_encoding >> col_idx) & 1:
-                                            tail_values[col_idx] = self.read_tail_page(col_idx, tail_idx, tail_pos)
-                                            
-                                    current_rid = self.read_tail_page(INDIRECTION_COLUMN, tail_idx, tail_pos)
-                                    update_count += 1
-                            else:
-                                update_count = 1
-                                
-                            # Prepare updates
-                            if update_count > 0:
-                                for col_idx in range(self.num_columns):
-                                    if tail_values[col_idx] is not None:
-                                        base_updates.append((base_idx, base_pos, col_idx, tail_values[col_idx]))
-                                
-                                # Metadata updates
-                                base_updates.append((base_idx, base_pos, SCHEMA_ENCODING_COLUMN, 0))
-                                base_updates.append((base_idx, base_pos, INDIRECTION_COLUMN, bid))
-                                
-                                if latest_timestamp is not None:
-                                    base_updates.append((base_idx, base_pos, TIMESTAMP_COLUMN, latest_timestamp))
-                                
-                                processed_bids.add(bid)
-                                merge_count += 1
-                        except Exception as e:
-                            print(f"Error processing tail record: {e}")
-        
-        # Batch update the base pages
-        return base_updates, merge_count
+        records_per_page = self.geometry.records_per_page
+        # The columns a merge rewrites, updates only ever touch the indirection and schema
+        # columns of a base record, which stay live
+        columns = list(range(self.num_columns)) + [TIMESTAMP_COLUMN]
+
+        # Only the base pages of the ranges being merged are visited, and of those only the
+        # full ones: inserts may still be writing into the last one
+        base_indices = [base_idx for page_range in page_ranges
+                        for base_idx in page_range.base_page_indices(len(base_pages))
+                        if base_pages[base_idx] is not None and not base_pages[base_idx].has_capacity()]
+        if base_indices:
+            # Prefetch all needed pages to buffer pool
+            self._prefetch_pages_for_merge(base_indices[0])
+
+        # Base pages first: an update writes its tail record and page directory entry
+        # before the base record points at it, so the tail pages and the directory taken
+        # afterwards hold every tail record the base snapshot points at
+        pages = [(base_idx,
+                  self.read_page_image("base", base_idx, INDIRECTION_COLUMN),
+                  self.read_page_image("base", base_idx, RID_COLUMN),
+                  {self.column_slot(col_idx): self.read_page_image("base", base_idx, col_idx) for col_idx in columns})
+                 for base_idx in base_indices]
+        # Tables saved before page ranges existed have their older tail pages shared
+        tail_indices = [tail_idx for tail_idx, range_id in enumerate(self._tail_page_ranges())
+                        if range_id == -1 and self.tail_pages[tail_idx] is not None]
+        for page_range in page_ranges:
+            tail_indices.extend(page_range.tail_pages)
+        tail_images = {(tail_idx, self.column_slot(col_idx)): self.read_page_image("tail", tail_idx, col_idx)
+                       for tail_idx in tail_indices for col_idx in columns}
+
+        if self.merge_mode == "process":
+            result = merge_process_pool().submit(consolidate, records_per_page, pages, tail_images,
+                                                 self.page_directory.tail_window).result()
+        else:
+            result = consolidate(records_per_page, pages, tail_images, self.page_directory.tail_window)
+
+        merged_pages = []
+        merge_count = 0
+        for base_idx, images, merged in result:
+            new_pages = {}
+            for col_slot, image in images.items():
+                page = Page(records_per_page)
+                page.load_bytes(image)
+                page.num_records = base_pages[base_idx].num_records
+                page.is_dirty = True
+                page.cold = True  # Read-mostly from now on, written back whole and compressed
+                new_pages[col_slot] = page
+            merged_pages.append((base_idx, new_pages, merged))
+            merge_count += len(merged)
+
+        return merged_pages, merge_count
 
     # Add this helper method to Table class
-    def _prefetch_pages_for_merge(self):
+    def _prefetch_pages_for_merge(self, start_page=0):
         """Prefetch pages that will be needed for merge operation"""
         from .db import db_instance
         
-        # Estimate records needing updates
-        for base_idx in range(len(self.base_pages)):
-            base_page = self.base_pages[base_idx]
-            if base_page is None:
-                continue
-                
-            # Prefetch key metadata columns
-            for col_idx in [INDIRECTION_COLUMN, RID_COLUMN, SCHEMA_ENCODING_COLUMN]:
-                db_instance._load_page_if_needed(self.name, "base", base_idx, col_idx)
-    
-    def _merge_completed(self, future):
+        # The merge walks the metadata and data columns of the merged base pages in order,
+        # let read-ahead load them in the background instead of all at once up front
+        for col_idx in [INDIRECTION_COLUMN, RID_COLUMN, TIMESTAMP_COLUMN] + list(range(self.num_columns)):
+            db_instance.hint_sequential(self.name, "base", self.column_slot(col_idx), start_page)
+
+    """
+    # Swaps merged pages built by _merge_worker in for the live ones. Each column goes into
+    # the buffer pool and the logical page as one pointer swap, readers holding a pin on an
+    # old page finish on it and it goes away with the last of them. Only then does a record
+    # point back at its base page, and only if no update came in since its tail record was
+    # merged, which later updates chain from as before
+    """
+    def _swap_merged_page(self, base_idx, new_pages, merged):
+        from .db import db_instance
+
+        logical_page = self.base_pages[base_idx]
+        for col_slot, page in new_pages.items():
+            # A mapped old page would change under its readers once the new one is written
+            # to the same slot, copy it out first (the pool does the same for its copy)
+            with logical_page.PinLock:
+                old_page = logical_page.columns[col_slot]
+                if old_page is not None:
+                    old_page.detach()
+            db_instance.replace_page_in_bufferpool(self.name, "base", base_idx, col_slot, page)
+            with logical_page.PinLock:
+                logical_page.columns[col_slot] = page
+
+        # Updates write the indirection column under the same PinLock, so comparing and
+        # resetting a pointer cannot lose one
+        page = self._pin_page("base", base_idx, INDIRECTION_COLUMN)
+        try:
+            with logical_page.PinLock:
+                indirections = page.read_many(0, logical_page.num_records)
+                for base_pos, bid, tid in merged:
+                    if indirections[base_pos] == tid:
+                        indirections[base_pos] = bid
+                page.write_many(0, indirections)
+        finally:
+            self._unpin_page("base", base_idx, page)
+        self.dirty_base_pages.add(base_idx)
+
+    def _merge_completed(self, future, merged_updates):
         try:
             # completed future result
-            base_updates, merge_count = future.result()
+            merged_pages, merge_count = future.result()
             
-            # apply updates atomically on the main thread
-            for base_idx, base_pos, col_idx, value in base_updates:
-                self.write_base_page(col_idx, value, base_idx, base_pos)
+            for base_idx, new_pages, merged in merged_pages:
+                self._swap_merged_page(base_idx, new_pages, merged)
             
-            # reset updates counter
-            self.updates = 0
+            # take the merged tail records off the update counters
+            for page_range, updates in merged_updates:
+                page_range.updates = max(page_range.updates - updates, 0)
+                self.updates = max(self.updates - updates, 0)
+            self._mark_cold_pages([base_idx for page_range, _ in merged_updates
+                                   for base_idx in page_range.base_page_indices(len(self.base_pages))])
+
+            # The merged pages hold the latest values now, tighten their zones to them
+            for base_idx, _, _ in merged_pages:
+                self.rebuild_zone(base_idx)
+
+            # Pages retired by the previous merge have had a whole merge for their readers
+            # to finish, those found unneeded now wait for the next one
+            self._free_tail_pages(self.retired_tail_pages)
+            self.retired_tail_pages = self._reclaimable_tail_pages([page_range for page_range, _ in merged_updates],
+                                                                   merged_pages)
             
             print(f"Background merge completed: {merge_count} records updated")
-            
-            # rebuild indices if needed
-            if merge_count > 0:
-                for col_idx in range(self.num_columns):
-                    if self.index.indices[col_idx] is not None:
-                        self.index.drop_index(col_idx)
-                        self.index.create_index(col_idx)
+            # The indices follow every update already and a merge does not change the
+            # latest values, so they stay as they are
         
         except Exception as e:
             print(f"Error in merge completion: {e}")
@@ -460,16 +769,117 @@ class Table:
             # reset merge flag
             self.merge_in_progress = False
     
+    """
+    # Full tail pages of page_ranges that no reader of the latest or an older version
+    # needs anymore, given the merged pages _merge_worker built. A tail record is needed
+    # while the indirection chain of its base record reaches it before the tail record
+    # the merge consolidated; every record older than that one is consolidated as well.
+    # The newest tail page of a range still takes updates and is never reclaimed
+    """
+    def _reclaimable_tail_pages(self, page_ranges, merged_pages):
+        page_directory = self.page_directory
+        records_per_page = self.geometry.records_per_page
+        candidates = []  # [(tail_idx, tids), ...]
+        for page_range in page_ranges:
+            for tail_idx in page_range.tail_pages[:-1]:
+                tail_page = self.tail_pages[tail_idx]
+                if tail_page is None or tail_page.num_records < records_per_page:
+                    continue
+                tids = self.read_tail_column(RID_COLUMN, tail_idx, 0, records_per_page)
+                # Slots still being written hold no tail rid yet and keep the page, tail
+                # rids are odd
+                if 0 not in tids:
+                    candidates.append((tail_idx, tids))
+        if not candidates:
+            return []
+
+        merged_tids = {(base_idx, base_pos): tid for base_idx, _, merged in merged_pages
+                       for base_pos, _, tid in merged}
+        needed = set()
+        for page_range in page_ranges:
+            for base_idx in page_range.base_page_indices(len(self.base_pages)):
+                num_records = self.base_pages[base_idx].num_records
+                indirections = self.read_base_column(INDIRECTION_COLUMN, base_idx, 0, num_records)
+                for base_pos, rid in enumerate(indirections):
+                    # Records the merge left alone need their whole chain
+                    consolidated = merged_tids.get((base_idx, base_pos))
+                    while rid & 1 and rid != consolidated:
+                        location = page_directory.get(rid)
+                        if location is None:
+                            break
+                        needed.add(rid)
+                        rid = self.read_tail_page(INDIRECTION_COLUMN, location[0], location[1])
+        return [tail_idx for tail_idx, tids in candidates if needed.isdisjoint(tids)]
+
+    """
+    # Releases retired tail pages: their tail records leave the page directory, their
+    # pages the buffer pool, and their indices are handed out to new tail pages again,
+    # which reuses their space in the tail segment file too. An update that was linking
+    # one of their tail records to its base record while they were retired keeps the
+    # page, a later merge looks at it again
+    """
+    def _free_tail_pages(self, tail_indices):
+        freed = False
+        latest = {}  # range_id -> indirections of the range's base records
+        for tail_idx in tail_indices:
+            tail_page = self.tail_pages[tail_idx]
+            page_range = next((page_range for page_range in self.page_ranges
+                               if tail_idx in page_range.tail_pages), None)
+            if tail_page is None or page_range is None:
+                continue
+            if page_range.range_id not in latest:
+                latest[page_range.range_id] = set()
+                for base_idx in page_range.base_page_indices(len(self.base_pages)):
+                    num_records = self.base_pages[base_idx].num_records
+                    latest[page_range.range_id].update(self.read_base_column(INDIRECTION_COLUMN, base_idx, 0, num_records))
+            tids = self.read_tail_column(RID_COLUMN, tail_idx, 0, tail_page.num_records)
+            if not latest[page_range.range_id].isdisjoint(tids):
+                continue
+            for tid in tids:
+                self.page_directory.discard(tid)
+            with page_range.lock:
+                page_range.tail_pages.remove(tail_idx)
+            with self.page_lock:
+                self._drop_tail_page(tail_idx)
+                self.tail_pages[tail_idx] = None
+                self.dirty_tail_pages.discard(tail_idx)
+                self.free_tail_pages.append(tail_idx)
+            freed = True
+        if freed:
+            self.page_directory.trim()
+
+    def _drop_tail_page(self, tail_idx):
+        from .db import db_instance
+        if db_instance is None:
+            return
+        for col_slot in range(self.num_columns + 4):
+            db_instance.bufferpool.remove((self.name, "tail", tail_idx, col_slot))
+
+    def _mark_cold_pages(self, base_indices):
+        """
+        Full base pages are read-mostly once merged, have them written back compressed.
+        Updates keep writing the indirection and schema encoding columns, those stay raw
+        """
+        for base_idx in base_indices:
+            base_page = self.base_pages[base_idx]
+            if base_page is None or base_page.has_capacity() or base_page.cold:
+                continue
+            for col_idx in list(range(self.num_columns)) + [RID_COLUMN, TIMESTAMP_COLUMN]:
+                page = self._pin_page("base", base_idx, col_idx)
+                try:
+                    with base_page.PinLock:
+                        if not page.cold:
+                            page.cold = True
+                            page.is_dirty = True
+                finally:
+                    self._unpin_page("base", base_idx, page)
+            base_page.cold = True
+            self.dirty_base_pages.add(base_idx)
+
     def should_merge(self):
         if hasattr(self, 'merge_in_progress') and self.merge_in_progress:
             return False
 
-        base_records = sum(page.num_records for page in self.base_pages)
-
-        avg_chain_length = self.updates / base_records if base_records> 0 else 0
-        
-        ### Threshold for deciding to merge ###
-        AVG_CHAIN_LENGTH_THRESHOLD = 3.0  # Average chain length
-        
-        # decide based on update chains
-        return avg_chain_length > AVG_CHAIN_LENGTH_THRESHOLD
\ No newline at end of file
+        # A page range is due once its own tail records outnumber its base records
+        # MERGE_CHAIN_LENGTH times over, see reserve_tail_slot
+        return bool(self.ranges_to_merge)
\ No newline at end of file
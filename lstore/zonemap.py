@@ -0,0 +1,152 @@
+import threading
+
+"""
+Zone maps: per base page synopses of every data column, the smallest and largest value
+any version of a record in the page has held and the number of live records, rolled up
+per page range as well. They are kept up to date on insert, update and delete and
+recomputed exactly for the pages a merge rewrote.
+
+A zone only ever widens between merges, so it may cover values no record holds anymore
+but never misses one a record holds now. That is what pruning needs: a page whose zone
+does not overlap a range cannot match, and a page whose zone lies inside the range and
+has no deleted records matches as a whole.
+"""
+
+EMPTY_MIN = (1 << 63) - 1  # Zone of a page without records, overlaps nothing
+EMPTY_MAX = -(1 << 63)
+
+class ZoneMap:
+
+    def __init__(self, num_columns, pages_per_range):
+        self.num_columns = num_columns
+        self.pages_per_range = pages_per_range
+        # Per base page: list of column minimums, list of column maximums, live records
+        self.mins = []
+        self.maxs = []
+        self.counts = []
+        # The same per page range, each covering pages_per_range consecutive base pages
+        self.range_mins = []
+        self.range_maxs = []
+        self.range_counts = []
+        self.lock = threading.Lock()  # Widening is read-modify-write, concurrent writers must not lose one
+        # page_idx -> [(columns, values), ...] widenings made while the page is recomputed,
+        # applied again on top of the exact zone by set_page
+        self.rebuilding = {}
+
+    def __len__(self):
+        return len(self.counts)
+
+    """
+    # Zone map of pages with the given zones, flat lists holding num_columns values per page
+    """
+    @classmethod
+    def from_pages(cls, num_columns, pages_per_range, mins, maxs, counts):
+        zone_map = cls(num_columns, pages_per_range)
+        for page_idx, count in enumerate(counts):
+            start = page_idx * num_columns
+            zone_map.begin_rebuild(page_idx)
+            zone_map.set_page(page_idx, mins[start:start + num_columns], maxs[start:start + num_columns], count)
+        return zone_map
+
+    def _ensure(self, page_idx):
+        while len(self.counts) <= page_idx:
+            self.mins.append([EMPTY_MIN] * self.num_columns)
+            self.maxs.append([EMPTY_MAX] * self.num_columns)
+            self.counts.append(0)
+        while len(self.range_counts) <= page_idx // self.pages_per_range:
+            self.range_mins.append([EMPTY_MIN] * self.num_columns)
+            self.range_maxs.append([EMPTY_MAX] * self.num_columns)
+            self.range_counts.append(0)
+
+    def _widen(self, page_idx, columns, values):
+        mins, maxs = self.mins[page_idx], self.maxs[page_idx]
+        range_idx = page_idx // self.pages_per_range
+        range_mins, range_maxs = self.range_mins[range_idx], self.range_maxs[range_idx]
+        for col, value in zip(columns, values):
+            if value < mins[col]:
+                mins[col] = value
+                if value < range_mins[col]:
+                    range_mins[col] = value
+            if value > maxs[col]:
+                maxs[col] = value
+                if value > range_maxs[col]:
+                    range_maxs[col] = value
+
+    """
+    # A record with values (one per data column) was inserted into page_idx
+    """
+    def add(self, page_idx, values):
+        with self.lock:
+            self._ensure(page_idx)
+            self._widen(page_idx, range(self.num_columns), values)
+            if page_idx in self.rebuilding:
+                self.rebuilding[page_idx].append((range(self.num_columns), values))
+            self.counts[page_idx] += 1
+            self.range_counts[page_idx // self.pages_per_range] += 1
+
+    """
+    # A record of page_idx was updated, columns took the new values
+    """
+    def update(self, page_idx, columns, values):
+        with self.lock:
+            self._ensure(page_idx)
+            self._widen(page_idx, columns, values)
+            if page_idx in self.rebuilding:
+                self.rebuilding[page_idx].append((columns, values))
+
+    """
+    # A record of page_idx was deleted
+    """
+    def remove(self, page_idx):
+        with self.lock:
+            self._ensure(page_idx)
+            self.counts[page_idx] -= 1
+            self.range_counts[page_idx // self.pages_per_range] -= 1
+
+    """
+    # Starts recomputing the zone of page_idx from its records, see set_page
+    """
+    def begin_rebuild(self, page_idx):
+        with self.lock:
+            self.rebuilding[page_idx] = []
+
+    """
+    # Replaces the zone of page_idx with an exact one computed since begin_rebuild, widened
+    # again by the records written meanwhile, and recomputes its page range. A count of
+    # None keeps the number of live records
+    """
+    def set_page(self, page_idx, mins, maxs, count=None):
+        with self.lock:
+            self._ensure(page_idx)
+            self.mins[page_idx] = list(mins)
+            self.maxs[page_idx] = list(maxs)
+            if count is not None:
+                self.counts[page_idx] = count
+            for columns, values in self.rebuilding.pop(page_idx, []):
+                self._widen(page_idx, columns, values)
+            range_idx = page_idx // self.pages_per_range
+            first = range_idx * self.pages_per_range
+            pages = range(first, min(first + self.pages_per_range, len(self.counts)))
+            self.range_mins[range_idx] = [min(self.mins[p][col] for p in pages) for col in range(self.num_columns)]
+            self.range_maxs[range_idx] = [max(self.maxs[p][col] for p in pages) for col in range(self.num_columns)]
+            self.range_counts[range_idx] = sum(self.counts[p] for p in pages)
+
+    """
+    # Yields (page_idx, inside) for the first num_pages base pages that may hold a value
+    # of column in [low, high], whole page ranges at a time where their zone allows it.
+    # inside is True when every value the page holds lies in [low, high]
+    """
+    def candidates(self, column, low, high, num_pages):
+        with self.lock:
+            self._ensure(num_pages - 1)
+        for range_idx in range(-(-num_pages // self.pages_per_range)):
+            range_min, range_max = self.range_mins[range_idx][column], self.range_maxs[range_idx][column]
+            if range_max < low or range_min > high:
+                continue
+            range_inside = low <= range_min and range_max <= high
+            first = range_idx * self.pages_per_range
+            for page_idx in range(first, min(first + self.pages_per_range, num_pages)):
+                page_min, page_max = self.mins[page_idx][column], self.maxs[page_idx][column]
+                if page_max < low or page_min > high:
+                    continue
+                yield page_idx, range_inside or (low <= page_min and page_max <= high)
@@ -0,0 +1,60 @@
+from lstore.db import Database
+from lstore.query import Query
+from random import choice, randint, seed
+from time import perf_counter, sleep
+import os
+
+# Foreground updates and selects per second with no merge running and while a merge of
+# every page range runs, with merges consolidated on the merge thread and in worker
+# processes. The merge thread shares the GIL with the foreground either way, but in
+# "process" mode it only takes snapshots and swaps the merged pages in. The worker
+# processes need cores of their own to pay off, on a single core they take turns with
+# the foreground on top of copying the snapshots. The worker processes import this script
+# again, hence the __main__ guard.
+number_of_records = 50000
+number_of_updates = 100000
+number_of_operations = 20000
+
+def foreground(query, keys, count):
+    for i in range(0, count):
+        if i % 2:
+            query.update(choice(keys), None, randint(0, 100), None, None, None)
+        else:
+            query.select(choice(keys), 0, [1, 1, 1, 1, 1])
+
+if __name__ == "__main__":
+    print(f"{os.cpu_count()} cores")
+    for merge_mode in ["thread", "process"]:
+        seed(3562901)
+        db = Database(bufferpool_capacity=100000, merge_mode=merge_mode)
+        grades_table = db.create_table('Grades', 5, 0)
+        query = Query(grades_table)
+        keys = [906659671 + i for i in range(0, number_of_records)]
+        for key in keys:
+            query.insert(key, 93, 0, 0, 0)
+        # Two updates per record on average, short of what makes a page range due, so merges
+        # only start when merge() is called
+        for i in range(0, number_of_updates):
+            query.update(choice(keys), None, randint(0, 100), None, None, None)
+        if merge_mode == "process":
+            # Start the worker processes outside the measurement
+            grades_table.merge()
+            while grades_table.merge_in_progress:
+                sleep(0.01)
+            for i in range(0, number_of_updates):
+                query.update(choice(keys), None, randint(0, 100), None, None, None)
+
+        time_0 = perf_counter()
+        foreground(query, keys, number_of_operations)
+        time_1 = perf_counter()
+        grades_table.merge()
+        operations = 0
+        while grades_table.merge_in_progress:
+            foreground(query, keys, 100)
+            operations += 100
+        time_2 = perf_counter()
+
+        idle = number_of_operations / (time_1 - time_0)
+        during = operations / (time_2 - time_1)
+        print(f"{merge_mode:>7}: idle {idle:.0f} ops/s\tduring merge {during:.0f} ops/s "
+              f"({during / idle:.0%})\tmerge {time_2 - time_1:.2f}s")
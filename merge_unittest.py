@@ -1,26 +1,42 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import time
+import tempfile
+import shutil
 import sys
 import os
 
 # Add the parent directory to sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from lstore.table import Table
+from lstore.table import thread_pool
+import lstore.table
+from lstore.db import Database
 from lstore.query import Query
 from lstore.config import (
     INDIRECTION_COLUMN,
     RID_COLUMN,
     TIMESTAMP_COLUMN,
     SCHEMA_ENCODING_COLUMN,
+    PAGE_SIZE,
 )
 
 class TestTableMerge(unittest.TestCase):
     def setUp(self):
-        # Create a table with 3 columns and primary key at index 0
-        self.table = Table("test_table", 3, 0)
+        # Create a table with 3 columns and primary key at index 0, 128 records per base page
+        self.db = Database()
+        self.table = self.db.create_table("test_table", 3, 0, page_size=1024)
         self.query = Query(self.table)
+
+    def merge(self):
+        # Merges only consolidate full base pages and run in the background
+        key = 1000
+        while self.table.base_pages[0].has_capacity():
+            self.query.insert(key, 0, 0)
+            key += 1
+        self.assertTrue(self.table.merge())
+        while self.table.merge_in_progress:
+            time.sleep(0.01)
         
     def test_merge_single_update(self):
         """Test merging a single update into base page"""
@@ -58,14 +74,14 @@ class TestTableMerge(unittest.TestCase):
         self.assertEqual(self.table.read_tail_page(2, tail_idx, tail_pos), 30)
         
         # Now run merge
-        self.table.merge()
+        self.merge()
         
         # Verify that the base page has been updated and metadata reset
         self.assertEqual(self.table.read_base_page(0, base_idx, base_pos), 10)
         self.assertEqual(self.table.read_base_page(1, base_idx, base_pos), 25)  # Updated value
         self.assertEqual(self.table.read_base_page(2, base_idx, base_pos), 30)
         self.assertEqual(self.table.read_base_page(INDIRECTION_COLUMN, base_idx, base_pos), bid)  # Reset to point to itself
-        self.assertEqual(self.table.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx, base_pos), 0)  # Reset schema encoding
+        self.assertEqual(self.table.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx, base_pos), 1 << 1)  # Left as it is
         
     def test_merge_multiple_updates(self):
         """Test merging multiple updates to the same record"""
@@ -86,14 +102,14 @@ class TestTableMerge(unittest.TestCase):
         self.assertEqual(self.table.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx, base_pos), (1 << 1) | (1 << 2))
         
         # Run merge
-        self.table.merge()
+        self.merge()
         
         # Verify all values merged correctly
         self.assertEqual(self.table.read_base_page(0, base_idx, base_pos), 10)
         self.assertEqual(self.table.read_base_page(1, base_idx, base_pos), 25)
         self.assertEqual(self.table.read_base_page(2, base_idx, base_pos), 35)
         self.assertEqual(self.table.read_base_page(INDIRECTION_COLUMN, base_idx, base_pos), bid)
-        self.assertEqual(self.table.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx, base_pos), 0)
+        self.assertEqual(self.table.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx, base_pos), (1 << 1) | (1 << 2))
         
     def test_merge_multiple_records(self):
         """Test merging updates for multiple records"""
@@ -106,7 +122,7 @@ class TestTableMerge(unittest.TestCase):
         self.query.update(11, None, None, 36)
         
         # Run merge
-        self.table.merge()
+        self.merge()
         
         # Verify first record
         bid1 = 0
@@ -115,7 +131,7 @@ class TestTableMerge(unittest.TestCase):
         self.assertEqual(self.table.read_base_page(1, base_idx1, base_pos1), 25)
         self.assertEqual(self.table.read_base_page(2, base_idx1, base_pos1), 30)
         self.assertEqual(self.table.read_base_page(INDIRECTION_COLUMN, base_idx1, base_pos1), bid1)
-        self.assertEqual(self.table.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx1, base_pos1), 0)
+        self.assertEqual(self.table.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx1, base_pos1), 1 << 1)
         
         # Verify second record
         bid2 = 2
@@ -124,7 +140,7 @@ class TestTableMerge(unittest.TestCase):
         self.assertEqual(self.table.read_base_page(1, base_idx2, base_pos2), 21)
         self.assertEqual(self.table.read_base_page(2, base_idx2, base_pos2), 36)
         self.assertEqual(self.table.read_base_page(INDIRECTION_COLUMN, base_idx2, base_pos2), bid2)
-        self.assertEqual(self.table.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx2, base_pos2), 0)
+        self.assertEqual(self.table.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx2, base_pos2), 1 << 2)
     
     def test_merge_no_updates(self):
         """Test merging when there are no updates to merge"""
@@ -143,7 +159,7 @@ class TestTableMerge(unittest.TestCase):
         }
         
         # Run merge (nothing should change)
-        self.table.merge()
+        self.merge()
         
         # Verify state remained the same
         self.assertEqual(self.table.read_base_page(0, base_idx, base_pos), initial_state["col0"])
@@ -152,5 +168,250 @@ class TestTableMerge(unittest.TestCase):
         self.assertEqual(self.table.read_base_page(INDIRECTION_COLUMN, base_idx, base_pos), initial_state["indirection"])
         self.assertEqual(self.table.read_base_page(SCHEMA_ENCODING_COLUMN, base_idx, base_pos), initial_state["schema"])
 
+class TestPageRanges(unittest.TestCase):
+    def test_updates_land_in_tail_pages_of_their_range(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database()
+            db.open(path)
+            # 128 records per page, 2 base pages per range
+            table = db.create_table('Grades', 3, 0, page_size=1024, base_pages_per_range=2)
+            query = Query(table)
+            for i in range(600):
+                query.insert(i, i, 0)
+            self.assertEqual(len(table.page_ranges), 3)
+            for i in range(200):
+                query.update(i * 3, None, None, 1)
+            # Keys 0 to 255 live in range 0, 256 to 511 in range 1, the rest in range 2
+            self.assertEqual([len(r.tail_pages) for r in table.page_ranges], [1, 1, 1])
+            self.assertEqual([r.updates for r in table.page_ranges], [86, 85, 29])
+            for page_range in table.page_ranges:
+                for tail_idx in page_range.tail_pages:
+                    for slot in range(table.tail_pages[tail_idx].num_records):
+                        base_rid = table.read_record("tail", tail_idx, slot, [0])[0] * 2
+                        self.assertIs(table.page_range_of(table.page_directory[base_rid][0]), page_range)
+            db.close()
+
+            db = Database()
+            db.open(path)
+            table = db.get_table('Grades')
+            self.assertEqual([r.tail_pages for r in table.page_ranges], [[0], [1], [2]])
+            Query(table).update(599, None, None, 2)
+            self.assertEqual(table.page_ranges[2].tail_pages, [2])
+            self.assertEqual(Query(table).sum(0, 599, 2), 202)
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_merge_only_ranges_that_are_due(self):
+        db = Database()
+        # One 128 record base page per range
+        table = db.create_table('Grades', 3, 0, page_size=1024, base_pages_per_range=1)
+        table.index.create_index(1)
+        query = Query(table)
+        for i in range(512):
+            query.insert(i, 0, 0)
+        query.update(0, None, None, 5)
+        for version in range(1, 4):
+            for i in range(128, 256):
+                query.update(i, None, version, None)
+        self.assertEqual(table.ranges_to_merge, set())
+        query.update(128, None, 4, None)
+        self.assertEqual(table.ranges_to_merge, {1})
+
+        self.assertTrue(table.merge())
+        while table.merge_in_progress:
+            time.sleep(0.01)
+        self.assertEqual([r.updates for r in table.page_ranges], [1, 0, 0, 0])
+        self.assertEqual(table.read_base_column(1, 1, 0, 3), [4, 3, 3])
+        self.assertEqual(table.read_base_page(2, 0, 0), 0)
+        # Updates keep the secondary index current without a rebuild
+        self.assertEqual(sorted(table.index.locate(1, 3)), list(range(258, 512, 2)))
+        self.assertEqual(len(table.index.locate(1, 0)), 384)
+
+    def test_merge_swaps_in_new_base_pages(self):
+        db = Database()
+        # 128 records per page, both base pages in range 0
+        table = db.create_table('Grades', 3, 0, page_size=1024, base_pages_per_range=2)
+        query = Query(table)
+        for i in range(256):
+            query.insert(i, 0, 0)
+        for i in range(256):
+            query.update(i, None, 1, None)
+        old_page = table._pin_page("base", 0, 1)
+
+        merged_updates = [(page_range, page_range.updates) for page_range in table.page_ranges]
+        future = thread_pool.submit(table._merge_worker, table.page_ranges)
+        future.result()
+        # Lands between building the merged pages and swapping them in
+        query.update(5, None, 2, None)
+        table._merge_completed(future, merged_updates)
+
+        # A reader that pinned the old page before the swap still sees it unchanged
+        self.assertEqual(old_page.read_many(0, 3), [0, 0, 0])
+        table._unpin_page("base", 0, old_page)
+        self.assertIsNot(db.get_page_from_bufferpool('Grades', 'base', 0, 1), old_page)
+        self.assertEqual(table.read_base_column(1, 0, 0, 6), [1] * 6)
+        # Merged records point at their base record again, the one updated meanwhile
+        # keeps its newer tail record
+        indirections = table.read_base_column(-1, 0, 0, 6)
+        self.assertEqual([rid & 1 for rid in indirections], [0, 0, 0, 0, 0, 1])
+        self.assertEqual(query.select(5, 0, [1, 1, 1])[0].columns, [5, 2, 0])
+        self.assertEqual(query.sum(0, 255, 1), 257)
+
+    def test_merge_keeps_mapped_pages_of_readers(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database()
+            db.open(path)
+            table = db.create_table('Grades', 3, 0, page_size=1024, base_pages_per_range=2)
+            query = Query(table)
+            for i in range(256):
+                query.insert(i, 0, 0)
+            db.close()
+
+            db = Database(mmap_pages=True)
+            db.open(path)
+            table = db.get_table('Grades')
+            query = Query(table)
+            for i in range(256):
+                query.update(i, None, 1, None)
+            old_page = table._pin_page("base", 0, 1)
+            self.assertIsInstance(old_page.data, memoryview)
+
+            merged_updates = [(page_range, page_range.updates) for page_range in table.page_ranges]
+            future = thread_pool.submit(table._merge_worker, table.page_ranges)
+            future.result()
+            table._merge_completed(future, merged_updates)
+            # The merged page goes to the slot the old page was mapped from
+            db.checkpoint()
+
+            self.assertEqual(old_page.read_many(0, 3), [0, 0, 0])
+            table._unpin_page("base", 0, old_page)
+            self.assertEqual(query.sum(0, 255, 1), 256)
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_merge_reclaims_consolidated_tail_pages(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database()
+            db.open(path)
+            # 128 records per page, both base pages in range 0
+            table = db.create_table('Grades', 3, 0, page_size=1024, base_pages_per_range=2)
+            query = Query(table)
+
+            def update_all(version):
+                for i in range(256):
+                    query.update(i, None, version, None)
+
+            def merge():
+                self.assertTrue(table.merge())
+                while table.merge_in_progress:
+                    time.sleep(0.01)
+
+            for i in range(256):
+                query.insert(i, 0, 0)
+            for version in range(1, 4):
+                update_all(version)
+            merge()
+            # Every full tail page but the newest is retired, and only freed by the next merge
+            self.assertEqual(table.retired_tail_pages, [0, 1, 2, 3, 4])
+            self.assertEqual(len(table.page_directory), 256 + 768)
+            update_all(4)
+            merge()
+            self.assertEqual(sorted(table.free_tail_pages), [0, 1, 2, 3, 4])
+            self.assertEqual(table.retired_tail_pages, [5, 6])
+            self.assertEqual(len(table.page_directory), 256 + 3 * 128)
+            self.assertEqual(table.page_directory.tail_start, 640)
+            self.assertEqual(query.select(7, 0, [1, 1, 1])[0].columns, [7, 4, 0])
+            # Older versions are gone with their tail records, the base record holds them
+            self.assertEqual(query.select_version(7, 0, [1, 1, 1], -2)[0].columns, [7, 4, 0])
+
+            update_all(5)
+            self.assertEqual(table.num_tail_pages, 8)  # Freed pages are reused
+            self.assertEqual(query.sum(0, 255, 1), 256 * 5)
+            self.assertEqual(query.select_version(7, 0, [1, 1, 1], -1)[0].columns, [7, 4, 0])
+            db.close()
+
+            db = Database()
+            db.open(path)
+            table = db.get_table('Grades')
+            query = Query(table)
+            self.assertEqual(len(table.free_tail_pages), 3)
+            self.assertEqual(query.sum(0, 255, 1), 256 * 5)
+            update_all(6)
+            self.assertEqual(table.num_tail_pages, 8)
+            self.assertEqual(query.select(200, 0, [1, 1, 1])[0].columns, [200, 6, 0])
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_merge_modes_build_the_same_pages(self):
+        with self.assertRaises(ValueError):
+            Database(merge_mode="fiber")
+        merged = {}
+        path = tempfile.mkdtemp()
+        for mode in ["thread", "process"]:
+            db = Database(merge_mode=mode)
+            db.open(os.path.join(path, mode))
+            table = db.create_table('Grades', 3, 0, page_size=1024, base_pages_per_range=1)
+            query = Query(table)
+            for i in range(300):
+                query.insert(i, i, 0)
+            for i in range(0, 300, 3):
+                query.update(i, None, None, i * 2)
+            self.assertTrue(table.merge())
+            while table.merge_in_progress:
+                time.sleep(0.01)
+            merged[mode] = [table.read_base_column(col_idx, base_idx, 0, 128)
+                            for base_idx in range(2) for col_idx in [0, 1, 2, -1]]
+            self.assertEqual(query.sum(0, 299, 2), sum(i * 2 for i in range(0, 300, 3)))
+            db.close()
+        shutil.rmtree(path, ignore_errors=True)
+        # Closing the database stops the worker processes
+        self.assertIsNone(lstore.table.process_pool)
+        self.assertEqual(merged["thread"], merged["process"])
+        self.assertEqual(merged["process"][2][:4], [0, 0, 0, 6])
+
+class TestColdPages(unittest.TestCase):
+    def test_merged_pages_are_stored_compressed(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database()
+            db.open(path)
+            table = db.create_table('Grades', 5, 0)
+            query = Query(table)
+            for i in range(1024):
+                query.insert(i, i % 3, 7, 7, 7)
+            for i in range(0, 1024, 2):
+                query.update(i, None, None, 8, None, None)
+            db.checkpoint()
+            db.reset_stats()
+            merged_updates = [(page_range, page_range.updates) for page_range in table.page_ranges]
+            table._merge_completed(thread_pool.submit(table._merge_worker, table.page_ranges), merged_updates)
+            db.checkpoint()
+            # 2 full base pages of 7 cold columns, all of them constant, runs or progressions,
+            # and the indirection column the merge reset, which updates keep writing raw
+            self.assertLess(db.stats()['bytes_written'], 2 * PAGE_SIZE + 2 * 7 * PAGE_SIZE // 16)
+            db.close()
+
+            db = Database(read_ahead_pages=0)
+            db.open(path)
+            query = Query(db.get_table('Grades'))
+            self.assertEqual(query.select(10, 0, [1, 1, 1, 1, 1])[0].columns, [10, 1, 8, 7, 7])
+            self.assertEqual(query.sum(0, 1023, 2), 512 * 8 + 512 * 7)
+            page = db.get_page_from_bufferpool('Grades', 'base', 1, 2)
+            self.assertTrue(page.cold)
+            self.assertLess(page.size_bytes(), PAGE_SIZE)
+            table = db.get_table('Grades')
+            page = table._pin_page('base', 1, -1)
+            self.assertFalse(page.cold)
+            table._unpin_page('base', 1, page)
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
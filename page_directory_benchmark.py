@@ -0,0 +1,42 @@
+from lstore.db import Database
+from lstore.query import Query
+from lstore.page_directory import PageDirectory
+from random import randint, seed
+from time import perf_counter
+import tracemalloc
+
+# Memory per record of the RID -> location map, the dict of lists it replaced against
+# PageDirectory, and the cost of looking a location up in each.
+number_of_records = 100000
+number_of_lookups = 100000
+
+seed(3562901)
+db = Database(bufferpool_capacity=100000)
+grades_table = db.create_table('Grades', 5, 0)
+query = Query(grades_table)
+for i in range(0, number_of_records):
+    query.insert(906659671 + i, 93, 0, 0, 0)
+for i in range(0, number_of_records // 10):
+    query.update(906659671 + randint(0, number_of_records - 1), None, randint(0, 100), None, None, None)
+entries = list(grades_table.page_directory.items())
+rids = [entries[randint(0, len(entries) - 1)][0] for i in range(0, number_of_lookups)]
+
+def build_dict():
+    return {rid: [page, slot] for rid, (page, slot) in entries}
+
+def build_page_directory():
+    directory = PageDirectory(grades_table.geometry.records_per_page)
+    for rid, location in entries:
+        directory[rid] = location
+    return directory
+
+for name, build in [("dict of lists", build_dict), ("PageDirectory", build_page_directory)]:
+    tracemalloc.start()
+    directory = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    time_0 = perf_counter()
+    for rid in rids:
+        directory[rid]
+    time_1 = perf_counter()
+    print(f"{name}:\t{size / len(entries):.1f} bytes/record\tlookup {(time_1 - time_0) / number_of_lookups * 1e9:.0f} ns")
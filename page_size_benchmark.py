@@ -0,0 +1,49 @@
+from lstore.db import Database
+from lstore.query import Query
+from random import choice, randint, seed
+from time import perf_counter, sleep
+import shutil
+
+# Inserts, point selects, range sums and a full merge on the same table for a range of
+# page sizes. Small pages cost more per-page overhead (more page objects, more pool
+# entries), large ones read and write more bytes than a point lookup needs.
+path = './ECS165_page_size'
+number_of_records = 10000
+number_of_operations = 5000
+
+for page_size in [1024, 4096, 16384, 65536]:
+    shutil.rmtree(path, ignore_errors=True)
+    seed(3562901)
+    db = Database(page_size=page_size)
+    db.open(path)
+    grades_table = db.create_table('Grades', 5, 0)
+    query = Query(grades_table)
+    keys = [906659671 + i for i in range(0, number_of_records)]
+
+    time_0 = perf_counter()
+    for key in keys:
+        query.insert(key, 93, 0, 0, 0)
+    time_1 = perf_counter()
+    for i in range(0, number_of_operations):
+        query.select(choice(keys), 0, [1, 1, 1, 1, 1])
+    time_2 = perf_counter()
+    for i in range(0, 100):
+        start = randint(0, number_of_records - 1000)
+        query.sum(keys[start], keys[start + 999], 1)
+    time_3 = perf_counter()
+
+    for i in range(0, number_of_operations):
+        query.update(choice(keys), None, randint(0, 100), None, None, None)
+    while grades_table.merge_in_progress:
+        sleep(0.01)
+    time_4 = perf_counter()
+    grades_table.merge()
+    while grades_table.merge_in_progress:
+        sleep(0.01)
+    time_5 = perf_counter()
+
+    print(f"page size {page_size:>5}: insert {time_1 - time_0:.2f}s\tselect {time_2 - time_1:.2f}s\t"
+          f"sum {time_3 - time_2:.2f}s\tmerge {time_5 - time_4:.2f}s\t({len(grades_table.base_pages)} base pages)")
+    db.close()
+
+shutil.rmtree(path, ignore_errors=True)
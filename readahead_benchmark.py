@@ -0,0 +1,32 @@
+from lstore.db import Database
+from lstore.query import Query
+from time import perf_counter
+import shutil
+
+# Cold full-range sums over a table much larger than the buffer pool, with and without
+# read-ahead. The database is reopened before each run so every page starts on disk.
+path = './ECS165_readahead'
+number_of_records = 5000
+
+shutil.rmtree(path, ignore_errors=True)
+db = Database()
+db.open(path)
+grades_table = db.create_table('Grades', 5, 0)
+query = Query(grades_table)
+for i in range(0, number_of_records):
+    query.insert(906659671 + i, 93, 0, 0, 0)
+db.close()
+
+for read_ahead_pages in [0, 8, 32]:
+    db = Database(bufferpool_capacity=20, read_ahead_pages=read_ahead_pages)
+    db.open(path)
+    query = Query(db.get_table('Grades'))
+    time_0 = perf_counter()
+    for column in range(0, 5):
+        query.sum(906659671, 906659671 + number_of_records - 1, column)
+    time_1 = perf_counter()
+    loaded = db.read_ahead.pages_loaded if db.read_ahead is not None else 0
+    print(f"read-ahead {read_ahead_pages:>2} pages:\t{time_1 - time_0:.2f} seconds\t({loaded} pages read ahead)")
+    db.close()
+
+shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,37 @@
+from lstore.db import Database
+from lstore.query import Query
+from random import choice, seed
+from time import perf_counter
+
+# Per-record cost of reading every column of a record one read_base_page call at a time
+# and with a single read_record call, and of full-record selects, for a narrow and a
+# wide table. Everything fits in the buffer pool, so this measures the pinning overhead.
+number_of_records = 5000
+number_of_reads = 5000
+
+for number_of_columns in [5, 50]:
+    seed(3562901)
+    db = Database(bufferpool_capacity=100000)
+    grades_table = db.create_table('Grades', number_of_columns, 0)
+    query = Query(grades_table)
+    keys = [906659671 + i for i in range(0, number_of_records)]
+    for key in keys:
+        query.insert(key, *range(1, number_of_columns))
+    locations = [grades_table.page_directory[grades_table.index.locate(0, choice(keys))[0]]
+                 for i in range(0, number_of_reads)]
+    columns = list(range(number_of_columns))
+
+    time_0 = perf_counter()
+    for base_idx, base_pos in locations:
+        [grades_table.read_base_page(col_idx, base_idx, base_pos) for col_idx in columns]
+    time_1 = perf_counter()
+    for base_idx, base_pos in locations:
+        grades_table.read_record("base", base_idx, base_pos, columns)
+    time_2 = perf_counter()
+    for i in range(0, number_of_reads):
+        query.select(choice(keys), 0, [1] * number_of_columns)
+    time_3 = perf_counter()
+
+    print(f"{number_of_columns} columns: per column {(time_1 - time_0) / number_of_reads * 1e6:.1f} us/record\t"
+          f"read_record {(time_2 - time_1) / number_of_reads * 1e6:.1f} us/record\t"
+          f"select {(time_3 - time_2) / number_of_reads * 1e6:.1f} us/record")
@@ -0,0 +1,41 @@
+from lstore.db import Database
+from lstore.page import Page
+from time import process_time
+from random import randrange, seed
+
+# Replays a page-level trace shaped like our mixed workload against each replacement
+# policy: point selects mostly hit a small hot set of pages (one in five goes to a cold
+# page anywhere in the table), and every so often a
+# full-range sum (or a merge prefetch) walks every base page of a much larger table once.
+# A policy that lets the scans flush the hot pages shows a low hit ratio.
+capacity = 1000
+hot_pages = 600
+hot_start = 10000  # The hot set sits in the middle of the table
+table_pages = 20000
+number_of_rounds = 20
+selects_per_round = 20000
+
+page = Page()
+
+for policy in ["lru", "clock", "2q", "arc"]:
+    seed(3562901)
+    # One shard so every policy manages the whole pool
+    db = Database(bufferpool_capacity=capacity, bufferpool_policy=policy, bufferpool_shards=1)
+
+    def touch(page_index):
+        # Same calls Table makes for one column read
+        p = db.get_page_from_bufferpool('Grades', "base", page_index, 0)
+        db.add_page_to_bufferpool('Grades', "base", page_index, 0, page if p is None else p)
+
+    time_0 = process_time()
+    for _ in range(number_of_rounds):
+        for _ in range(selects_per_round):
+            if randrange(0, 5):
+                touch(hot_start + randrange(0, hot_pages))
+            else:
+                touch(randrange(0, table_pages))
+        for page_index in range(table_pages):
+            touch(page_index)
+    time_1 = process_time()
+
+    print(f"{policy:>5}: hit ratio {db.bufferpool.hit_ratio():.3f}\ttook {time_1 - time_0:.2f} seconds")
@@ -0,0 +1,57 @@
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lstore.db import Database
+from lstore.query import Query
+
+class TestZoneMap(unittest.TestCase):
+    def test_sums_and_scans_prune_pages(self):
+        path = tempfile.mkdtemp()
+        try:
+            db = Database()
+            db.open(path)
+            table = db.create_table('Grades', 3, 0)
+            query = Query(table)
+            expected = {}
+            for i in range(2000):
+                query.insert(i, i // 100, 1)
+                expected[i] = [i, i // 100, 1]
+            query.update(5, None, 99, 7)
+            expected[5] = [5, 99, 7]
+            query.delete(1500)
+            del expected[1500]
+
+            zone_map = table.zone_map
+            self.assertEqual((zone_map.mins[0][1], zone_map.maxs[0][1]), (0, 99))
+            self.assertEqual(zone_map.counts[2], 511)
+            # Pages 1 to 3 hold keys 512 to 2047, only page 3 lies inside the range whole
+            self.assertEqual(list(zone_map.candidates(0, 1536, 3000, 4)), [(3, True)])
+            for low, high in [(0, 1999), (10, 700), (1400, 1600), (1536, 1999)]:
+                for column in range(3):
+                    total = sum(row[column] for key, row in expected.items() if low <= key <= high)
+                    self.assertEqual(query.sum(low, high, column), total)
+
+            # Column 1 has no index, select scans the pages its zone map allows
+            self.assertEqual([r.columns for r in query.select(99, 1, [1, 1, 1])], [[5, 99, 7]])
+            self.assertEqual(len(query.select(15, 1, [1, 1, 1])), 99)
+            self.assertEqual(query.select(1000, 1, [1, 1, 1]), [])
+            db.close()
+
+            db = Database()
+            db.open(path)
+            table = db.get_table('Grades')
+            self.assertEqual((table.zone_map.mins[0][1], table.zone_map.maxs[0][1]), (0, 99))
+            self.assertEqual(table.zone_map.counts, [512, 512, 511, 464])
+            self.assertEqual(Query(table).sum(0, 1999, 2), 1999 + 6)
+            db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+if __name__ == '__main__':
+    unittest.main()